@@ -23,14 +23,48 @@ Python Fedora
 
 Modules to communicate with and help implement Fedora Services.
 '''
-import kitchen
-# Setup gettext for all of kitchen.
-# Remember -- _() is for marking most messages
-# b_() is for marking messages that are used in exceptions
-(_, N_) = kitchen.i18n.easy_gettext_setup('python-fedora')
-(b_, bN_) = kitchen.i18n.easy_gettext_setup('python-fedora', use_unicode=False)
+import os
+import sys
 
 from fedora import release
 __version__ = release.VERSION
 
+_GETTEXT_NAMES = ('_', 'N_', 'b_', 'bN_')
+
+
+def _setup_gettext():
+    '''Setup gettext for all of python-fedora.
+
+    Remember -- _() is for marking most messages
+    b_() is for marking messages that are used in exceptions
+    '''
+    import kitchen.i18n
+    global _, N_, b_, bN_
+    (_, N_) = kitchen.i18n.easy_gettext_setup('python-fedora')
+    (b_, bN_) = kitchen.i18n.easy_gettext_setup('python-fedora',
+                                                use_unicode=False)
+
+
+def _fedora_dir():
+    '''Return the directory the fedora package is installed in.'''
+    try:
+        # python >= 3.9
+        from importlib.resources import files as resource_files
+    except ImportError:
+        return os.path.dirname(__file__)
+    return str(resource_files('fedora'))
+
+
+def __getattr__(name):
+    # Loading the message catalogs is only done by the modules that need them
+    if name in _GETTEXT_NAMES:
+        _setup_gettext()
+        return globals()[name]
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ (PEP 562)
+    _setup_gettext()
+
 __all__ = ('__version__', 'accounts', 'client', 'release', 'tg')
@@ -0,0 +1,402 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''
+Small caches used to avoid repeated round trips to services.
+
+Caches implement ``get(key, default=None)``, ``set(key, value)``,
+``invalidate(key)``, and ``items()`` and count their :attr:`hits` and
+:attr:`misses` so that code taking a cache can be given any of them.
+
+.. versionadded:: 0.10.1
+'''
+from collections import OrderedDict
+import errno
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+from six.moves import cPickle as pickle
+
+_MISSING = object()
+
+
+class LRUCache(object):
+    '''A threadsafe mapping with a bounded size and an optional time to live.
+
+    When more than :attr:`maxsize` entries are stored, the least recently
+    used entry is discarded.  If :attr:`ttl` is set, entries older than that
+    many seconds are treated as absent.
+
+    .. attribute:: hits
+
+        Number of lookups that found a live entry
+
+    .. attribute:: misses
+
+        Number of lookups that did not find a live entry
+    '''
+
+    def __init__(self, maxsize=1024, ttl=None, timer=time.time):
+        '''Create an empty cache.
+
+        :kwarg maxsize: Maximum number of entries to keep.  Default: 1024
+        :kwarg ttl: Number of seconds an entry stays valid.  If None (the
+            default), entries only leave the cache when they are evicted.
+        :kwarg timer: Function returning the current time in seconds.  Mostly
+            useful for testing.
+        '''
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        '''Return the value stored for `key`, or `default` if there's none.'''
+        with self._lock:
+            try:
+                expires, value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= self.timer():
+                self.misses += 1
+                return default
+            # Reinsert to mark the entry as the most recently used
+            self._data[key] = (expires, value)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        '''Store `value` for `key`.
+
+        :kwarg ttl: Override the cache's time to live for this entry.
+        '''
+        if ttl is _MISSING:
+            ttl = self.ttl
+        expires = None
+        if ttl is not None:
+            expires = self.timer() + ttl
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        '''Remove `key` from the cache if it is present.'''
+        with self._lock:
+            self._data.pop(key, None)
+
+    def items(self):
+        '''Return a list of the ``(key, value)`` pairs that haven't expired.
+        '''
+        now = self.timer()
+        with self._lock:
+            return [(key, value) for key, (expires, value)
+                    in self._data.items()
+                    if expires is None or expires > now]
+
+    def clear(self):
+        '''Remove every entry from the cache.'''
+        with self._lock:
+            self._data.clear()
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.invalidate(key)
+
+    def __contains__(self, key):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return False
+            return expires is None or expires > self.timer()
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_rate(self):
+        '''Fraction of lookups that found a live entry.'''
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits) / lookups
+
+
+class NullCache(object):
+    '''A cache that doesn't store anything.
+
+    Lets code that takes a cache have caching turned off without checking
+    for it everywhere.
+    '''
+
+    hits = 0
+
+    def __init__(self):
+        self.misses = 0
+
+    def get(self, key, default=None):
+        '''Return `default`.'''
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl=None):
+        '''Do nothing.'''
+
+    def invalidate(self, key):
+        '''Do nothing.'''
+
+    def items(self):
+        '''Return an empty list.'''
+        return []
+
+    def clear(self):
+        '''Do nothing.'''
+
+    hit_rate = LRUCache.hit_rate
+
+    def __getitem__(self, key):
+        self.get(key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        pass
+
+    def __delitem__(self, key):
+        pass
+
+    def __contains__(self, key):
+        return False
+
+    def __len__(self):
+        return 0
+
+
+def _check_private_dir(directory):
+    '''Make sure only the current user can create files in `directory`.
+
+    :raises fedora.client.UnsafeFileError: if `directory` is a symlink, is
+        owned by another user, or is group or world writable
+    '''
+    # Imported here because fedora.client imports this module
+    from fedora.client import UnsafeFileError
+
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise UnsafeFileError(directory, 'Not a directory')
+    if info.st_uid != os.getuid():
+        raise UnsafeFileError(directory, 'Directory not owned by current user')
+    if info.st_mode & 0o022:
+        raise UnsafeFileError(directory,
+                              'Directory is group or world writable')
+
+
+def _default_cache_dir():
+    '''Return the private directory holding the default SQLiteCache.
+
+    The directory is :file:`python-fedora` in :envvar:`XDG_RUNTIME_DIR`
+    (memory backed and only accessible by the user) or in
+    :file:`~/.cache` when that isn't set.  It is created with mode 0700.
+    '''
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if not base or not os.path.isdir(base):
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    directory = os.path.join(base, 'python-fedora')
+    try:
+        os.makedirs(directory, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    return directory
+
+
+class SQLiteCache(object):
+    '''A cache shared by all the processes on a host.
+
+    The entries are pickled into an SQLite database.  Putting the database
+    on a memory backed filesystem (the default is a file in
+    :envvar:`XDG_RUNTIME_DIR` when it is set) lets every worker of a web
+    application share one cache without any extra daemon.
+
+    Since the entries are unpickled, nobody but the user running the
+    application may be able to write to the database or to the journal
+    SQLite creates next to it.  The database is created with mode 0600 and
+    :exc:`fedora.client.UnsafeFileError` is raised if an existing file is a
+    symlink, is owned by another user, or is group or world writable, or if
+    its directory is writable by other users (like :file:`/tmp` or
+    :file:`/dev/shm`).
+
+    When more than :attr:`maxsize` entries are stored, the ones stored
+    longest ago are discarded.  :attr:`hits` and :attr:`misses` are counted
+    per process.
+    '''
+
+    def __init__(self, filename=None, maxsize=4096, ttl=None,
+                 timer=time.time):
+        '''Open or create the cache.
+
+        :kwarg filename: Path to the database.  Its directory must only be
+            writable by the current user.  Default: :file:`cache.sqlite` in
+            the directory returned by :func:`_default_cache_dir`
+        :kwarg maxsize: Maximum number of entries to keep.  Default: 4096
+        :kwarg ttl: Number of seconds an entry stays valid.  If None (the
+            default), entries only leave the cache when they are evicted.
+        :kwarg timer: Function returning the current time in seconds.
+        '''
+        # Imported here because fedora.client imports this module
+        from fedora.client import check_file_permissions, UnsafeFileError
+
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+        if filename is None:
+            filename = os.path.join(_default_cache_dir(), 'cache.sqlite')
+        self.filename = filename
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+
+        # Never let sqlite open a file someone else could have written to
+        _check_private_dir(os.path.dirname(os.path.abspath(filename)))
+        check_file_permissions(filename, allow_notexists=True)
+        try:
+            fd = os.open(filename, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+            # Created by someone else since it was checked
+            check_file_permissions(filename)
+        else:
+            os.close(fd)
+        if os.stat(filename).st_mode & 0o022:
+            raise UnsafeFileError(filename, 'File is group or world writable')
+
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY,'
+            ' stored REAL NOT NULL, expires REAL, value BLOB NOT NULL)')
+
+    def _connection(self):
+        '''Return a connection for this thread and process.'''
+        # sqlite connections must not be shared between threads or carried
+        # over a fork()
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.connection = sqlite3.connect(
+                self.filename, timeout=10, isolation_level=None)
+            self._local.pid = pid
+        return self._local.connection
+
+    def get(self, key, default=None):
+        '''Return the value stored for `key`, or `default` if there's none.'''
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ?'
+            ' AND (expires IS NULL OR expires > ?)',
+            (key, self.timer())).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return pickle.loads(bytes(row[0]))
+
+    def set(self, key, value, ttl=_MISSING):
+        '''Store `value` for `key`.
+
+        :kwarg ttl: Override the cache's time to live for this entry.
+        '''
+        if ttl is _MISSING:
+            ttl = self.ttl
+        now = self.timer()
+        expires = None
+        if ttl is not None:
+            expires = now + ttl
+        data = sqlite3.Binary(pickle.dumps(value, 2))
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, stored, expires, value)'
+                ' VALUES (?, ?, ?, ?)', (key, now, expires, data))
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ? OR key IN (SELECT key'
+                ' FROM cache ORDER BY stored DESC LIMIT -1 OFFSET ?)',
+                (now, self.maxsize))
+
+    def invalidate(self, key):
+        '''Remove `key` from the cache if it is present.'''
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def items(self):
+        '''Return a list of the ``(key, value)`` pairs that haven't expired.
+        '''
+        rows = self._connection().execute(
+            'SELECT key, value FROM cache'
+            ' WHERE expires IS NULL OR expires > ?', (self.timer(),))
+        return [(key, pickle.loads(bytes(value))) for key, value in rows]
+
+    def clear(self):
+        '''Remove every entry from the cache.'''
+        self._connection().execute('DELETE FROM cache')
+
+    hit_rate = LRUCache.hit_rate
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.invalidate(key)
+
+    def __contains__(self, key):
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ?'
+            ' AND (expires IS NULL OR expires > ?)',
+            (key, self.timer())).fetchone() is not None
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM cache'
+            ' WHERE expires IS NULL OR expires > ?',
+            (self.timer(),)).fetchone()[0]
+
+
+__all__ = ('LRUCache', 'NullCache', 'SQLiteCache')
@@ -23,6 +23,8 @@ fedora.client is used to interact with Fedora Services.
     Deprecate DictContainer in favor of bunch.Bunch
 .. versionchanged:: 0.3.35
     Add the openid clients
+.. versionchanged:: 0.10.1
+    The client classes are imported the first time they are used
 
 .. moduleauthor:: Ricky Zhou <ricky@fedoraproject.org>
 .. moduleauthor:: Luke Macken <lmacken@redhat.com>
@@ -30,6 +32,7 @@ fedora.client is used to interact with Fedora Services.
 '''
 import errno
 import os
+import sys
 import warnings
 
 from munch import Munch
@@ -152,16 +155,42 @@ def check_file_permissions(filename, allow_notexists=False):
         raise UnsafeFileError(filename, 'File is world-readable')
 
 
-# We want people to be able to import fedora.client.*Client directly
-# pylint: disable-msg=W0611
-from fedora.client.proxyclient import ProxyClient
-from fedora.client.fasproxy import FasProxyClient
-from fedora.client.baseclient import BaseClient
-from fedora.client.openidproxyclient import OpenIdProxyClient
-from fedora.client.openidbaseclient import OpenIdBaseClient
-from fedora.client.fas2 import AccountSystem, FASError, CLAError
-from fedora.client.wiki import Wiki
-# pylint: enable-msg=W0611
+# We want people to be able to import fedora.client.*Client directly.  The
+# modules are only imported when one of their names is used so that programs
+# only pay for the clients they need.
+_LAZY_IMPORTS = {
+    'ProxyClient': 'fedora.client.proxyclient',
+    'FasProxyClient': 'fedora.client.fasproxy',
+    'BaseClient': 'fedora.client.baseclient',
+    'OpenIdProxyClient': 'fedora.client.openidproxyclient',
+    'OpenIdBaseClient': 'fedora.client.openidbaseclient',
+    'AccountSystem': 'fedora.client.fas2',
+    'FASError': 'fedora.client.fas2',
+    'CLAError': 'fedora.client.fas2',
+    'Wiki': 'fedora.client.wiki',
+}
+
+
+def __getattr__(name):
+    try:
+        module = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError('module %r has no attribute %r'
+                             % (__name__, name))
+    value = getattr(__import__(module, fromlist=[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ (PEP 562) so import everything now
+    for _name in _LAZY_IMPORTS:
+        __getattr__(_name)
+    del _name
 
 __all__ = ('FedoraServiceError', 'ServerError', 'AuthError', 'AppError',
            'FedoraClientError', 'LoginRequiredError', 'DictContainer',
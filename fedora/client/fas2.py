@@ -24,12 +24,20 @@ Provide a client module for talking to the Fedora Account System.
 .. moduleauthor:: Toshio Kuratomi <tkuratom@redhat.com>
 .. moduleauthor:: Ralph Bean <rbean@redhat.com>
 '''
+from array import array
+from bisect import bisect_left
 from hashlib import md5
 import itertools
+import json
+from multiprocessing.pool import ThreadPool
+import os
+import threading
 import warnings
 
 from munch import Munch
 from kitchen.text.converters import to_bytes
+import six
+from six.moves import intern
 from six.moves.urllib.parse import quote, urlencode
 
 try:
@@ -37,12 +45,22 @@ try:
 except ImportError:
     libravatar = None
 
+try:
+    from types import MappingProxyType
+except ImportError:
+    # python2 has no read-only dict view.  A copy that we never hand out
+    # for modification is the next best thing.
+    MappingProxyType = dict
+
 from fedora.client import (
-    AppError, BaseClient, FasProxyClient,
+    AppError, AuthError, BaseClient, FasProxyClient,
     FedoraClientError, FedoraServiceError
 )
 
 from fedora import __version__
+from fedora.cacheutils import LRUCache, NullCache
+
+_MISSING = object()
 
 ### FIXME: To merge:
 # /usr/bin/fasClient from fas
@@ -69,6 +87,368 @@ USERFIELDS = [
     'unverified_email', 'timezone', 'username', 'security_question',
     'security_answer', ]
 
+#: Roles reported by :meth:`AccountSystem.group_data`
+GROUP_ROLES = ('administrators', 'sponsors', 'users')
+
+
+class GroupMembers(object):
+    '''Compact record of the members of one FAS group.
+
+    The user ids for each role are kept in sorted :class:`array.array` so
+    that a group with thousands of members costs four bytes per membership
+    and membership tests are a binary search.
+
+    .. versionadded:: 0.10.1
+    '''
+    __slots__ = ('name', 'type', 'administrators', 'sponsors', 'users')
+
+    def __init__(self, name, type, administrators=(), sponsors=(), users=()):
+        self.name = name
+        self.type = type
+        # FAS person ids are postgres integers so they fit into a C int
+        self.administrators = array('i', sorted(administrators))
+        self.sponsors = array('i', sorted(sponsors))
+        self.users = array('i', sorted(users))
+
+    def has_member(self, user_id, roles=GROUP_ROLES):
+        '''Return whether `user_id` has one of `roles` in this group.'''
+        for role in roles:
+            ids = getattr(self, role)
+            index = bisect_left(ids, user_id)
+            if index < len(ids) and ids[index] == user_id:
+                return True
+        return False
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self.name)
+
+
+def _intern(name):
+    '''Intern a group name or type if it is a native string.
+
+    Other strings (unicode on python 2) are returned unchanged so the type of
+    the names doesn't depend on their content.
+    '''
+    if isinstance(name, str):
+        return intern(name)
+    return name
+
+
+class GroupData(object):
+    '''Compact, read-only version of the data returned by
+    :meth:`AccountSystem.group_data`.
+
+    Group names are interned and each group is stored as a
+    :class:`GroupMembers`.  Indexing with a group name returns its
+    :class:`GroupMembers`.  An index from user ids to their groups is built
+    when the data is loaded so :meth:`groups_of` doesn't look at every group.
+
+    .. versionadded:: 0.10.1
+    '''
+    __slots__ = ('_groups', '_groups_of')
+
+    def __init__(self, group_data):
+        '''Build the compact form.
+
+        :arg group_data: The dict returned by :meth:`AccountSystem.group_data`
+        '''
+        groups = {}
+        # For each role, user id => names of the groups with that role
+        groups_of = dict((role, {}) for role in GROUP_ROLES)
+        for name, group in group_data.items():
+            name = _intern(name)
+            groups[name] = GroupMembers(
+                name, _intern(group.get('type', '')),
+                *[group.get(role) or () for role in GROUP_ROLES])
+            for role in GROUP_ROLES:
+                index = groups_of[role]
+                for user_id in group.get(role) or ():
+                    index.setdefault(user_id, []).append(name)
+        for index in groups_of.values():
+            for user_id, names in index.items():
+                index[user_id] = tuple(names)
+        self._groups = groups
+        self._groups_of = groups_of
+
+    def is_member(self, user_id, group, roles=GROUP_ROLES):
+        '''Return whether a user belongs to a group.
+
+        :arg user_id: FAS id of the user
+        :arg group: name of the group
+        :kwarg roles: Only consider these roles.  Default: all of
+            administrators, sponsors, and users.
+        :returns: False if the user is not in the group or the group does
+            not exist.  True otherwise.
+        '''
+        members = self._groups.get(group)
+        if members is None:
+            return False
+        return members.has_member(user_id, roles)
+
+    def groups_of(self, user_id, roles=GROUP_ROLES):
+        '''Return the names of the groups a user belongs to.
+
+        :arg user_id: FAS id of the user
+        :kwarg roles: Only consider these roles.  Default: all of
+            administrators, sponsors, and users.
+        :returns: a list of group names, sorted
+        '''
+        names = set()
+        for role in roles:
+            names.update(self._groups_of[role].get(user_id, ()))
+        return sorted(names)
+
+    def __getitem__(self, group):
+        return self._groups[group]
+
+    def __contains__(self, group):
+        return group in self._groups
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
+
+
+# Preseed a list of FAS accounts with bugzilla addresses
+# This allows us to specify a different email for bugzilla than is
+# in the FAS db.  It is a hack, however, until FAS has a field for the
+# bugzilla address.
+_BUGZILLA_EMAIL = {
+        # Konstantin Ryabitsev: mricon@gmail.com
+        100029: 'icon@fedoraproject.org',
+        # Sean Reifschneider: jafo@tummy.com
+        100488: 'jafo-redhat@tummy.com',
+        # Karen Pease: karen-pease@uiowa.edu
+        100281: 'meme@daughtersoftiresias.org',
+        # Robert Scheck: redhat@linuxnetz.de
+        100093: 'redhat-bugzilla@linuxnetz.de',
+        # Scott Bakers: bakers@web-ster.com
+        100881: 'scott@perturb.org',
+        # Colin Charles: byte@aeon.com.my
+        100014: 'byte@fedoraproject.org',
+        # W. Michael Petullo: mike@flyn.org
+        100136: 'redhat@flyn.org',
+        # Elliot Lee: sopwith+fedora@gmail.com
+        100060: 'sopwith@redhat.com',
+        # Control Center Team: Bugzilla user but email doesn't exist
+        9908: 'control-center-maint@redhat.com',
+        # Máirín Duffy
+        100548: 'duffy@redhat.com',
+        # Muray McAllister: murray.mcallister@gmail.com
+        102321: 'mmcallis@redhat.com',
+        # William Jon McCann: mccann@jhu.edu
+        102489: 'jmccann@redhat.com',
+        # Matt Domsch's rebuild script -- bz email goes to /dev/null
+        103590: 'ftbfs@fedoraproject.org',
+        # Sindre Pedersen Bjørdal: foolish@guezz.net
+        100460: 'sindrepb@fedoraproject.org',
+        # Jesus M. Rodriguez: jmrodri@gmail.com
+        102180: 'jesusr@redhat.com',
+        # Roozbeh Pournader: roozbeh@farsiweb.info
+        100350: 'roozbeh@gmail.com',
+        # Michael DeHaan: michael.dehaan@gmail.com
+        100603: 'mdehaan@redhat.com',
+        # Sebastian Gosenheimer: sgosenheimer@googlemail.com
+        103647: 'sebastian.gosenheimer@proio.com',
+        # Ben Konrath: bkonrath@redhat.com
+        101156: 'ben@bagu.org',
+        # Kai Engert: kaie@redhat.com
+        100399: 'kengert@redhat.com',
+        # William Jon McCann: william.jon.mccann@gmail.com
+        102952: 'jmccann@redhat.com',
+        # Simon Wesp: simon@w3sp.de
+        109464: 'cassmodiah@fedoraproject.org',
+        # Robert M. Albrecht: romal@gmx.de
+        101475: 'mail@romal.de',
+        # Davide Cescato: davide.cescato@iaeste.ch
+        123204: 'ceski@fedoraproject.org',
+        # Nick Bebout: nick@bebout.net
+        101458: 'nb@fedoraproject.org',
+        # Niels Haase: haase.niels@gmail.com
+        126862: 'arxs@fedoraproject.org',
+        # Thomas Janssen: th.p.janssen@googlemail.com
+        103110: 'thomasj@fedoraproject.org',
+        # Michael J Gruber: 'michaeljgruber+fedoraproject@gmail.com'
+        105113: 'mjg@fedoraproject.org',
+        # Juan Manuel Rodriguez Moreno: 'nushio@gmail.com'
+        101302: 'nushio@fedoraproject.org',
+        # Andrew Cagney: 'andrew.cagney@gmail.com'
+        102169: 'cagney@fedoraproject.org',
+        # Jeremy Katz: 'jeremy@katzbox.net'
+        100036: 'katzj@fedoraproject.org',
+        # Dominic Hopf: 'dmaphy@gmail.com'
+        124904: 'dmaphy@fedoraproject.org',
+        # Christoph Wickert: 'christoph.wickert@googlemail.com':
+        100271: 'cwickert@fedoraproject.org',
+        # Elliott Baron: 'elliottbaron@gmail.com'
+        106760: 'ebaron@fedoraproject.org',
+        # Thomas Spura: 'spurath@students.uni-mainz.de'
+        111433: 'tomspur@fedoraproject.org',
+        # Adam Miller: 'maxamillion@gmail.com'
+        110673: 'admiller@redhat.com',
+        # Garrett Holmstrom: 'garrett.holmstrom@gmail.com'
+        131739: 'gholms@fedoraproject.org',
+        # Tareq Al Jurf: taljurf.fedora@gmail.com
+        109863: 'taljurf@fedoraproject.org',
+        # Josh Kayse: jokajak@gmail.com
+        148243: 'jokajak@fedoraproject.org',
+        # Behdad Esfahbod: fedora@behdad.org
+        100102: 'behdad@fedoraproject.org',
+        # Daniel Bruno: danielbrunos@gmail.com
+        101608: 'dbruno@fedoraproject.org',
+        # Beth Lynn Eicher: bethlynneicher@gmail.com
+        148706: 'bethlynn@fedoraproject.org',
+        # Andre Robatino: andre.robatino@verizon.net
+        114970: 'robatino@fedoraproject.org',
+        # Jeff Sheltren: jeff@tag1consulting.com
+        100058: 'sheltren@fedoraproject.org',
+        # Josh Boyer: jwboyer@gmail.com
+        100115: 'jwboyer@redhat.com',
+        # Matthew Miller: mattdm@mattdm.org
+        100042: 'mattdm@redhat.com',
+        # Jamie Nguyen: j@jamielinux.com
+        160587: 'jamielinux@fedoraproject.org',
+        # Nikos Roussos: nikos@roussos.cc
+        144436: 'comzeradd@fedoraproject.org',
+        # Benedikt Schäfer: benedikt@schaefer-flieden.de
+        154726: 'ib54003@fedoraproject.org',
+        # Ricky Elrod: codeblock@elrod.me
+        139137: 'relrod@redhat.com',
+        # David Xie: david.scriptfan@gmail.com
+        167133: 'davidx@fedoraproject.org',
+        # Felix Schwarz: felix.schwarz@oss.schwarz.eu
+        103551: 'fschwarz@fedoraproject.org',
+        # Martin Holec: martix@martix.names
+        137561: 'mholec@redhat.com',
+        # John Dulaney: j_dulaney@live.com
+        149140: 'jdulaney@fedoraproject.org',
+        # Niels de Vos: niels@nixpanic.net
+        102792: 'ndevos@redhat.com',
+        # Shawn Wells: shawn@redhat.com
+        156515: 'swells@redhat.com',
+        # Christopher Tubbs: ctubbsii+fedora@gmail.com
+        160404: 'ctubbsii@fedoraproject.org',
+        # Björn Esser: bjoern.esser@gmail.com
+        163460: 'besser82@fedoraproject.org',
+        # Amit Shah: amit@amitshah.net
+        115389: 'amitshah@fedoraproject.org',
+        # Mark Wielard: fedora@wildebeest.org
+        102697: 'mjw@fedoraproject.org',
+        # Benjamin Lefoul: benjamin.lefoul@nwise.se
+        189661: 'lef@fedoraproject.org',
+        # Mike Ruckman: roshi@mykolab.com
+        172063: 'roshi@fedoraproject.org',
+}
+# A few people have an email account that is used in owners.list but
+# have setup a bugzilla account for their primary account system email
+# address now.  Map these here.
+_ALTERNATE_EMAIL = {
+        # Damien Durand: splinux25@gmail.com
+        'splinux@fedoraproject.org': 100406,
+        # Kevin Fenzi: kevin@tummy.com
+        'kevin-redhat-bugzilla@tummy.com': 100037,
+}
+
+# We use the two mappings as follows::
+# When looking up a user by email, use ALTERNATE_EMAIL.
+# When looking up a bugzilla email address use BUGZILLA_EMAIL.
+#
+# This allows us to parse in owners.list and have a value for all the
+# emails in there while not using the alternate email unless it is
+# the only option.
+
+
+def _build_email_maps(overrides=None):
+    '''Build read-only bugzilla and alternate email maps.
+
+    :kwarg overrides: mapping of FAS person ids to bugzilla emails that
+        replace or extend the builtin entries
+    :returns: tuple of the bugzilla email map and the alternate email map
+    '''
+    bugzilla_email = dict(_BUGZILLA_EMAIL)
+    if overrides:
+        bugzilla_email.update((int(person_id), email)
+                              for person_id, email in overrides.items())
+    alternate_email = dict(_ALTERNATE_EMAIL)
+    for person_id, email in bugzilla_email.items():
+        alternate_email[email] = person_id
+    return MappingProxyType(bugzilla_email), MappingProxyType(alternate_email)
+
+
+# Read-only maps shared by every AccountSystem.  BUGZILLA_EMAIL maps FAS
+# person ids to bugzilla emails, ALTERNATE_EMAIL maps emails to person ids.
+BUGZILLA_EMAIL, ALTERNATE_EMAIL = _build_email_maps()
+
+# Maps built by load_bugzilla_emails().  Files are keyed by filename with
+# the modification time the maps were built for, mappings by their items.
+_email_maps = {}
+_email_maps_lock = threading.Lock()
+
+
+def load_bugzilla_emails(source):
+    '''Return the email maps with overrides taken from `source`.
+
+    The result is computed once per source and shared afterwards so this is
+    cheap to call each time an :class:`AccountSystem` is created.
+
+    :arg source: Either a mapping of FAS person ids to bugzilla emails (for
+        instance, a section of the application's config) or the filename of
+        a JSON file containing such an object.  A file is reread when its
+        modification time changes.
+    :returns: tuple of read-only mappings.  The first maps FAS person ids to
+        bugzilla emails, the second maps emails to FAS person ids.
+
+    .. versionadded:: 0.10.1
+    '''
+    if isinstance(source, six.string_types):
+        key = source
+        version = os.stat(source).st_mtime
+    else:
+        key = frozenset(source.items())
+        version = None
+
+    with _email_maps_lock:
+        cached_version, maps = _email_maps.get(key, (None, None))
+    if maps is None or cached_version != version:
+        if isinstance(source, six.string_types):
+            with open(source) as email_file:
+                overrides = json.load(email_file)
+        else:
+            overrides = source
+        maps = _build_email_maps(overrides)
+        with _email_maps_lock:
+            # Only the maps for the latest version of a file are kept
+            _email_maps[key] = (version, maps)
+    return maps
+
+
+_proxies = {}
+_proxies_lock = threading.Lock()
+
+
+def _shared_proxy(base_url, useragent, debug, insecure,
+                  password_cache_size=0, password_cache_ttl=60):
+    '''Return a :class:`FasProxyClient` shared by all clients with the same
+    settings.
+
+    :class:`FasProxyClient` is threadsafe so every :class:`AccountSystem`
+    talking to the same server can verify passwords through the same one.
+    '''
+    key = (base_url, useragent, debug, insecure, password_cache_size,
+           password_cache_ttl)
+    with _proxies_lock:
+        proxy = _proxies.get(key)
+        if proxy is None:
+            proxy = FasProxyClient(base_url, useragent=useragent,
+                                   session_as_cookie=False, debug=debug,
+                                   insecure=insecure,
+                                   password_cache_size=password_cache_size,
+                                   password_cache_ttl=password_cache_ttl)
+            _proxies[key] = proxy
+    return proxy
+
 
 class AccountSystem(BaseClient):
     '''An object for querying the Fedora Account System.
@@ -98,15 +478,38 @@ class AccountSystem(BaseClient):
     .. versionchanged:: 0.3.33
         Renamed :meth:`~fedora.client.AccountSystem.gravatar_url` to
         :meth:`~fedora.client.AccountSystem.avatar_url`.
+    .. versionchanged:: 0.10.1
+        Cache the emails and urls computed by
+        :meth:`~fedora.client.AccountSystem.avatar_url` and added
+        :meth:`~fedora.client.AccountSystem.avatar_urls`.
     '''
     # proxy is a thread-safe connection to the fas server for verifying
     # passwords of other users
     proxy = None
 
+    # Shared, read-only email maps.  __init__ replaces them when the caller
+    # asks for overrides.
+    __bugzilla_email = BUGZILLA_EMAIL
+    __alternate_email = ALTERNATE_EMAIL
+
     # size that we allow to request from remote avatar providers.
     _valid_avatar_sizes = (32, 64, 140)
     # URLs for remote avatar providers.
     _valid_avatar_services = ['libravatar', 'gravatar']
+    # Number of entries and lifetime in seconds of the username => email and
+    # avatar url caches.
+    avatar_cache_size = 1024
+    avatar_cache_ttl = 3600
+    # Number of verified credentials verify_password() remembers and for how
+    # many seconds.  0 disables the cache.  See
+    # :meth:`fedora.client.FasProxyClient.verify_password`
+    password_cache_size = 0
+    password_cache_ttl = 60
+    # Number of config entries get_config() remembers and for how many
+    # seconds.  0 (the default) disables the cache: a remembered entry
+    # doesn't see changes made by other clients until it expires.
+    config_cache_size = 0
+    config_cache_ttl = 300
 
     def __init__(self, base_url='https://admin.fedoraproject.org/accounts/',
                  *args, **kwargs):
@@ -124,169 +527,38 @@ class AccountSystem(BaseClient):
         :kwargs session_id: user's session_id to connect to the server
         :kwargs cache_session: if set to true, cache the user's session cookie
             on the filesystem between runs.
+        :kwargs bugzilla_emails: mapping of FAS person ids to bugzilla emails
+            or the filename of a JSON file holding one.  These entries
+            override the builtin bugzilla email map.  See
+            :func:`~fedora.client.fas2.load_bugzilla_emails`
+
+        .. versionchanged:: 0.10.1
+            Added the bugzilla_emails kwarg.  The email maps and the proxy
+            used to verify passwords are now shared between instances.
         '''
+        bugzilla_emails = kwargs.pop('bugzilla_emails', None)
         if 'useragent' not in kwargs:
             kwargs['useragent'] = \
                 'Fedora Account System Client/%s' % __version__
 
         super(AccountSystem, self).__init__(base_url, *args, **kwargs)
-        # We need a single proxy for the class to verify username/passwords
-        # against.
-        if not self.proxy:
-            self.proxy = FasProxyClient(base_url, useragent=self.useragent,
-                                        session_as_cookie=False,
-                                        debug=self.debug,
-                                        insecure=self.insecure)
-
-        # Preseed a list of FAS accounts with bugzilla addresses
-        # This allows us to specify a different email for bugzilla than is
-        # in the FAS db.  It is a hack, however, until FAS has a field for the
-        # bugzilla address.
-        self.__bugzilla_email = {
-            # Konstantin Ryabitsev: mricon@gmail.com
-            100029: 'icon@fedoraproject.org',
-            # Sean Reifschneider: jafo@tummy.com
-            100488: 'jafo-redhat@tummy.com',
-            # Karen Pease: karen-pease@uiowa.edu
-            100281: 'meme@daughtersoftiresias.org',
-            # Robert Scheck: redhat@linuxnetz.de
-            100093: 'redhat-bugzilla@linuxnetz.de',
-            # Scott Bakers: bakers@web-ster.com
-            100881: 'scott@perturb.org',
-            # Colin Charles: byte@aeon.com.my
-            100014: 'byte@fedoraproject.org',
-            # W. Michael Petullo: mike@flyn.org
-            100136: 'redhat@flyn.org',
-            # Elliot Lee: sopwith+fedora@gmail.com
-            100060: 'sopwith@redhat.com',
-            # Control Center Team: Bugzilla user but email doesn't exist
-            9908: 'control-center-maint@redhat.com',
-            # Máirín Duffy
-            100548: 'duffy@redhat.com',
-            # Muray McAllister: murray.mcallister@gmail.com
-            102321: 'mmcallis@redhat.com',
-            # William Jon McCann: mccann@jhu.edu
-            102489: 'jmccann@redhat.com',
-            # Matt Domsch's rebuild script -- bz email goes to /dev/null
-            103590: 'ftbfs@fedoraproject.org',
-            # Sindre Pedersen Bjørdal: foolish@guezz.net
-            100460: 'sindrepb@fedoraproject.org',
-            # Jesus M. Rodriguez: jmrodri@gmail.com
-            102180: 'jesusr@redhat.com',
-            # Roozbeh Pournader: roozbeh@farsiweb.info
-            100350: 'roozbeh@gmail.com',
-            # Michael DeHaan: michael.dehaan@gmail.com
-            100603: 'mdehaan@redhat.com',
-            # Sebastian Gosenheimer: sgosenheimer@googlemail.com
-            103647: 'sebastian.gosenheimer@proio.com',
-            # Ben Konrath: bkonrath@redhat.com
-            101156: 'ben@bagu.org',
-            # Kai Engert: kaie@redhat.com
-            100399: 'kengert@redhat.com',
-            # William Jon McCann: william.jon.mccann@gmail.com
-            102952: 'jmccann@redhat.com',
-            # Simon Wesp: simon@w3sp.de
-            109464: 'cassmodiah@fedoraproject.org',
-            # Robert M. Albrecht: romal@gmx.de
-            101475: 'mail@romal.de',
-            # Davide Cescato: davide.cescato@iaeste.ch
-            123204: 'ceski@fedoraproject.org',
-            # Nick Bebout: nick@bebout.net
-            101458: 'nb@fedoraproject.org',
-            # Niels Haase: haase.niels@gmail.com
-            126862: 'arxs@fedoraproject.org',
-            # Thomas Janssen: th.p.janssen@googlemail.com
-            103110: 'thomasj@fedoraproject.org',
-            # Michael J Gruber: 'michaeljgruber+fedoraproject@gmail.com'
-            105113: 'mjg@fedoraproject.org',
-            # Juan Manuel Rodriguez Moreno: 'nushio@gmail.com'
-            101302: 'nushio@fedoraproject.org',
-            # Andrew Cagney: 'andrew.cagney@gmail.com'
-            102169: 'cagney@fedoraproject.org',
-            # Jeremy Katz: 'jeremy@katzbox.net'
-            100036: 'katzj@fedoraproject.org',
-            # Dominic Hopf: 'dmaphy@gmail.com'
-            124904: 'dmaphy@fedoraproject.org',
-            # Christoph Wickert: 'christoph.wickert@googlemail.com':
-            100271: 'cwickert@fedoraproject.org',
-            # Elliott Baron: 'elliottbaron@gmail.com'
-            106760: 'ebaron@fedoraproject.org',
-            # Thomas Spura: 'spurath@students.uni-mainz.de'
-            111433: 'tomspur@fedoraproject.org',
-            # Adam Miller: 'maxamillion@gmail.com'
-            110673: 'admiller@redhat.com',
-            # Garrett Holmstrom: 'garrett.holmstrom@gmail.com'
-            131739: 'gholms@fedoraproject.org',
-            # Tareq Al Jurf: taljurf.fedora@gmail.com
-            109863: 'taljurf@fedoraproject.org',
-            # Josh Kayse: jokajak@gmail.com
-            148243: 'jokajak@fedoraproject.org',
-            # Behdad Esfahbod: fedora@behdad.org
-            100102: 'behdad@fedoraproject.org',
-            # Daniel Bruno: danielbrunos@gmail.com
-            101608: 'dbruno@fedoraproject.org',
-            # Beth Lynn Eicher: bethlynneicher@gmail.com
-            148706: 'bethlynn@fedoraproject.org',
-            # Andre Robatino: andre.robatino@verizon.net
-            114970: 'robatino@fedoraproject.org',
-            # Jeff Sheltren: jeff@tag1consulting.com
-            100058: 'sheltren@fedoraproject.org',
-            # Josh Boyer: jwboyer@gmail.com
-            100115: 'jwboyer@redhat.com',
-            # Matthew Miller: mattdm@mattdm.org
-            100042: 'mattdm@redhat.com',
-            # Jamie Nguyen: j@jamielinux.com
-            160587: 'jamielinux@fedoraproject.org',
-            # Nikos Roussos: nikos@roussos.cc
-            144436: 'comzeradd@fedoraproject.org',
-            # Benedikt Schäfer: benedikt@schaefer-flieden.de
-            154726: 'ib54003@fedoraproject.org',
-            # Ricky Elrod: codeblock@elrod.me
-            139137: 'relrod@redhat.com',
-            # David Xie: david.scriptfan@gmail.com
-            167133: 'davidx@fedoraproject.org',
-            # Felix Schwarz: felix.schwarz@oss.schwarz.eu
-            103551: 'fschwarz@fedoraproject.org',
-            # Martin Holec: martix@martix.names
-            137561: 'mholec@redhat.com',
-            # John Dulaney: j_dulaney@live.com
-            149140: 'jdulaney@fedoraproject.org',
-            # Niels de Vos: niels@nixpanic.net
-            102792: 'ndevos@redhat.com',
-            # Shawn Wells: shawn@redhat.com
-            156515: 'swells@redhat.com',
-            # Christopher Tubbs: ctubbsii+fedora@gmail.com
-            160404: 'ctubbsii@fedoraproject.org',
-            # Björn Esser: bjoern.esser@gmail.com
-            163460: 'besser82@fedoraproject.org',
-            # Amit Shah: amit@amitshah.net
-            115389: 'amitshah@fedoraproject.org',
-            # Mark Wielard: fedora@wildebeest.org
-            102697: 'mjw@fedoraproject.org',
-            # Benjamin Lefoul: benjamin.lefoul@nwise.se
-            189661: 'lef@fedoraproject.org',
-            # Mike Ruckman: roshi@mykolab.com
-            172063: 'roshi@fedoraproject.org',
-        }
-        # A few people have an email account that is used in owners.list but
-        # have setup a bugzilla account for their primary account system email
-        # address now.  Map these here.
-        self.__alternate_email = {
-            # Damien Durand: splinux25@gmail.com
-            'splinux@fedoraproject.org': 100406,
-            # Kevin Fenzi: kevin@tummy.com
-            'kevin-redhat-bugzilla@tummy.com': 100037,
-        }
-        for bugzilla_map in self.__bugzilla_email.items():
-            self.__alternate_email[bugzilla_map[1]] = bugzilla_map[0]
-
-        # We use the two mappings as follows::
-        # When looking up a user by email, use __alternate_email.
-        # When looking up a bugzilla email address use __bugzilla_email.
-        #
-        # This allows us to parse in owners.list and have a value for all the
-        # emails in there while not using the alternate email unless it is
-        # the only option.
+        self._email_cache = LRUCache(self.avatar_cache_size,
+                                     ttl=self.avatar_cache_ttl)
+        self._avatar_cache = LRUCache(self.avatar_cache_size,
+                                      ttl=self.avatar_cache_ttl)
+        if self.config_cache_size:
+            self._config_cache = LRUCache(self.config_cache_size,
+                                          ttl=self.config_cache_ttl)
+        else:
+            self._config_cache = NullCache()
+        # Use the shared email maps unless the caller wants to override
+        # some of the entries.
+        if bugzilla_emails:
+            self.__bugzilla_email, self.__alternate_email = \
+                load_bugzilla_emails(bugzilla_emails)
+        # FAS session of username used by _proxy_request()
+        self._proxy_session_id = None
+        self._proxy_lock = threading.Lock()
 
     # TODO: Use exceptions properly
 
@@ -298,9 +570,9 @@ class AccountSystem(BaseClient):
 
     def _set_insecure(self, insecure):
         self._insecure = insecure
-        self.proxy = FasProxyClient(self.base_url, useragent=self.useragent,
-                                    session_as_cookie=False, debug=self.debug,
-                                    insecure=insecure)
+        self.proxy = _shared_proxy(self.base_url, self.useragent, self.debug,
+                                   insecure, self.password_cache_size,
+                                   self.password_cache_ttl)
         return insecure
     #: If this attribute is set to True, do not check server certificates
     #: against their CA's.  This means that man-in-the-middle attacks are
@@ -481,6 +753,9 @@ class AccountSystem(BaseClient):
             of the user is used instead.
             Note that gravatar.com lookups will be much slower if lookup_email
             is set to True since we'd have to make a query against FAS itself.
+            The email and the resulting url are cached for
+            :attr:`avatar_cache_ttl` seconds so only the first lookup for a
+            user pays that price.
         :kwarg service: One of 'libravatar' or 'gravatar'.
             Default: 'libravatar'.
         :raises ValueError: if the size parameter is not allowed or if the
@@ -502,8 +777,61 @@ class AccountSystem(BaseClient):
             Renamed from `gravatar_url` to `avatar_url`
         .. versionchanged: 0.3.34
             Updated libravatar to use the user's openid identifier.
+        .. versionchanged: 0.10.1
+            Cache the email looked up in FAS and the computed url.
         '''
+        service = self._check_avatar_args(size, service)
+        if not default:
+            default = self._default_avatar(size)
+
+        cache_key = (username, size, default, bool(lookup_email), service)
+        url = self._avatar_cache.get(cache_key)
+        if url is not None:
+            return url
+
+        if service == 'libravatar':
+            url = self._libravatar_url(username, size, default)
+        else:
+            if lookup_email:
+                email = self._lookup_email(username)
+            else:
+                email = "%s@fedoraproject.org" % username
+            url = self._gravatar_url(email, size, default)
+
+        self._avatar_cache[cache_key] = url
+        return url
+
+    def avatar_urls(self, usernames, size=64, default=None,
+                    lookup_email=True, service=None, max_workers=8):
+        ''' Returns URLs to the avatars for several usernames at once.
 
+        This takes the same keyword arguments as :meth:`avatar_url`.  When
+        gravatar urls are requested with `lookup_email` set to True, the
+        emails of the users that are not already cached are retrieved from
+        FAS concurrently, one user per request.
+
+        :arg usernames: iterable of FAS usernames to construct avatar urls for
+        :kwarg max_workers: Maximum number of requests to make concurrently.
+            Default: 8
+        :raises ValueError: if the size parameter is not allowed or if the
+            service is not one of 'libravatar' or 'gravatar'
+        :rtype: :obj:`dict`
+        :returns: dict mapping each username to the url of its avatar
+
+        .. versionadded:: 0.10.1
+        '''
+        usernames = list(usernames)
+        service = self._check_avatar_args(size, service)
+        if service == 'gravatar' and lookup_email:
+            self._prefetch_emails(usernames, max_workers)
+
+        return dict((username, self.avatar_url(
+            username, size=size, default=default,
+            lookup_email=lookup_email, service=service))
+            for username in usernames)
+
+    def _check_avatar_args(self, size, service):
+        '''Validate the avatar size and service and return the service.'''
         if size not in self._valid_avatar_sizes:
             raise ValueError(
                 'Size %(size)i disallowed.  Must be in %(valid_sizes)r' % {
@@ -536,34 +864,62 @@ class AccountSystem(BaseClient):
                     'valid_services': self._valid_avatar_services
                 }
             )
+        return service
+
+    @staticmethod
+    def _default_avatar(size):
+        return "http://fedoraproject.org/static/images/" + \
+               "fedora_infinity_%ix%i.png" % (size, size)
+
+    @staticmethod
+    def _libravatar_url(username, size, default):
+        openid = 'http://%s.id.fedoraproject.org/' % username
+        return libravatar.libravatar_url(
+            openid=openid,
+            size=size,
+            default=default,
+        )
 
-        if not default:
-            default = "http://fedoraproject.org/static/images/" + \
-                      "fedora_infinity_%ix%i.png" % (size, size)
-
-        if service == 'libravatar':
-            openid = 'http://%s.id.fedoraproject.org/' % username
-            return libravatar.libravatar_url(
-                openid=openid,
-                size=size,
-                default=default,
-            )
-        else:
-            if lookup_email:
-                person = self.person_by_username(username)
-                email = person.get('email', 'no_email')
-            else:
-                email = "%s@fedoraproject.org" % username
-
-            query_string = urlencode({
-                's': size,
-                'd': default,
-            })
-
-            hash = md5(email.encode("utf-8")).hexdigest()
-
-            return "http://www.gravatar.com/avatar/%s?%s" % (
-                hash, query_string)
+    @staticmethod
+    def _gravatar_url(email, size, default):
+        query_string = urlencode({
+            's': size,
+            'd': default,
+        })
+
+        hash = md5(email.encode("utf-8")).hexdigest()
+
+        return "http://www.gravatar.com/avatar/%s?%s" % (
+            hash, query_string)
+
+    def _lookup_email(self, username):
+        '''Return the email FAS has for a user, caching the result.'''
+        email = self._email_cache.get(username)
+        if email is None:
+            person = self.person_by_username(username)
+            email = person.get('email', 'no_email')
+            self._email_cache[username] = email
+        return email
+
+    def _prefetch_emails(self, usernames, max_workers):
+        '''Fill the email cache for `usernames` with concurrent requests.'''
+        missing = sorted(set(username for username in usernames
+                             if username not in self._email_cache))
+        if len(missing) <= 1:
+            # avatar_url() looks the user up
+            return
+
+        def fetch(username):
+            # Listing the accounts sharing a prefix would download far more
+            # accounts than requested for common prefixes
+            request = self._proxy_request('json/person_by_username',
+                                          {'username': username})
+            person = request.get('person') or {}
+            return username, person.get('email')
+
+        emails = self._map_concurrently(fetch, missing, max_workers)
+        for username, email in emails:
+            self._email_cache[username] = email or 'no_email'
 
     def gravatar_url(self, *args, **kwargs):
         """ *Deprecated* - Use avatar_url.
@@ -783,6 +1139,11 @@ class AccountSystem(BaseClient):
     def get_config(self, username, application, attribute):
         '''Return the config entry for the key values.
 
+        If :attr:`config_cache_size` is set, values are cached for
+        :attr:`config_cache_ttl` seconds so reading the same entry again does
+        not contact the server.  :meth:`set_config` updates the cached entry
+        but changes made by other clients are only seen once it expires.
+
         :arg username: Username of the person
         :arg application: Application for which the config is set
         :arg attribute: Attribute key to lookup
@@ -790,7 +1151,15 @@ class AccountSystem(BaseClient):
         :returns: The unicode string that describes the value.  If no entry
             matched the username, application, and attribute then None is
             returned.
+
+        .. versionchanged:: 0.10.1
+            Optionally cache the returned value
         '''
+        key = (username, application, attribute)
+        value = self._config_cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
         request = self.send_request('config/list/%s/%s/%s' %
                                     (username, application, attribute),
                                     auth=True)
@@ -801,9 +1170,11 @@ class AccountSystem(BaseClient):
             )
 
         # Return the value if it exists, else None.
+        value = None
         if 'configs' in request and attribute in request['configs']:
-            return request['configs'][attribute]
-        return None
+            value = request['configs'][attribute]
+        self._config_cache[key] = value
+        return value
 
     def get_configs_like(self, username, application, pattern=u'*'):
         '''Return the config entries that match the keys and the pattern.
@@ -827,6 +1198,8 @@ class AccountSystem(BaseClient):
                 name=request['exc'],
                 message=request['tg_flash'])
 
+        for attribute, value in request['configs'].items():
+            self._config_cache[(username, application, attribute)] = value
         return request['configs']
 
     def set_config(self, username, application, attribute, value):
@@ -841,6 +1214,9 @@ class AccountSystem(BaseClient):
         :arg value: The value to set this to
         :raises AppError: if the server returns an exception
         '''
+        key = (username, application, attribute)
+        # Whatever happens, the cached value may not be right anymore
+        self._config_cache.invalidate(key)
         request = self.send_request(
             'config/set/%s/%s/%s' %
             (username, application, attribute),
@@ -850,6 +1226,158 @@ class AccountSystem(BaseClient):
             raise AppError(
                 name=request['exc'],
                 message=request['tg_flash'])
+        self._config_cache[key] = value
+
+    def get_configs_bulk(self, keys, max_workers=8):
+        '''Return many config entries at once.
+
+        The entries are grouped by username and application.  Each group
+        that isn't fully cached costs one request to the server and the
+        requests for the different groups are made concurrently.
+
+        :arg keys: iterable of ``(username, application, attribute)`` tuples
+        :kwarg max_workers: Maximum number of requests to make concurrently.
+            Default: 8
+        :raises AppError: if the server returns an exception
+        :returns: A dict mapping each ``(username, application, attribute)``
+            tuple to the value of the entry or None if there isn't one.
+
+        .. versionadded:: 0.10.1
+        '''
+        results = {}
+        to_fetch = {}
+        for key in keys:
+            value = self._config_cache.get(key, _MISSING)
+            if value is _MISSING:
+                to_fetch.setdefault(key[:2], set()).add(key[2])
+            else:
+                results[key] = value
+
+        def fetch(user_app):
+            request = self._proxy_request('config/list/%s/%s/*' % user_app)
+            if 'exc' in request:
+                raise AppError(name=request['exc'],
+                               message=request['tg_flash'])
+            return request
+
+        groups = list(to_fetch)
+        for user_app, request in zip(
+                groups, self._map_concurrently(fetch, groups, max_workers)):
+            configs = request.get('configs') or {}
+            for attribute, value in configs.items():
+                self._config_cache[user_app + (attribute,)] = value
+            for attribute in to_fetch[user_app]:
+                key = user_app + (attribute,)
+                results[key] = configs.get(attribute)
+                self._config_cache[key] = results[key]
+        return results
+
+    def set_configs_bulk(self, entries, max_workers=8):
+        '''Set many config entries at once.
+
+        The requests are made concurrently.
+
+        :arg entries: iterable of ``(username, application, attribute,
+            value)`` tuples
+        :kwarg max_workers: Maximum number of requests to make concurrently.
+            Default: 8
+        :raises AppError: if the server returns an exception for any of the
+            entries.  The other entries are still set.
+
+        .. versionadded:: 0.10.1
+        '''
+        entries = list(entries)
+
+        def store(entry):
+            username, application, attribute, value = entry
+            key = (username, application, attribute)
+            self._config_cache.invalidate(key)
+            try:
+                self._proxy_request(
+                    'config/set/%s/%s/%s' % key, req_params={'value': value})
+            except AppError as e:
+                return e
+            self._config_cache[key] = value
+
+        for error in self._map_concurrently(store, entries, max_workers):
+            if error is not None:
+                raise error
+
+    def _proxy_request(self, method, req_params=None):
+        '''Make an authenticated request through the threadsafe proxy.
+
+        Unlike :meth:`send_request`, this can be called from several threads
+        at once as it doesn't update the session stored on this object.  When
+        :attr:`username` and :attr:`password` are set, the FAS session
+        created by the first request is reused by the following ones.  Only
+        one thread logs in at a time, the others wait for its session.
+        '''
+        if not (self.username and self.password):
+            if not self.session_id:
+                raise AuthError(
+                    'Auth was requested but no way to'
+                    ' perform auth was given.  Please set username'
+                    ' and password or session_id before calling'
+                    ' this function with auth=True')
+            return self._proxy_send(
+                method, req_params, {'session_id': self.session_id})[1]
+
+        login_params = {'username': self.username, 'password': self.password}
+        if self.httpauth:
+            # The credentials are sent with every request anyway
+            login_params['httpauth'] = self.httpauth
+            return self._proxy_send(method, req_params, login_params)[1]
+
+        session_id = self._proxy_session_id
+        if session_id:
+            try:
+                return self._proxy_session_request(method, req_params,
+                                                   session_id)
+            except AuthError:
+                # The session expired, log in again
+                with self._proxy_lock:
+                    if self._proxy_session_id == session_id:
+                        self._proxy_session_id = None
+
+        with self._proxy_lock:
+            session_id = self._proxy_session_id
+            if not session_id:
+                session_id, data = self._proxy_send(method, req_params,
+                                                    login_params)
+                self._proxy_session_id = session_id or None
+                return data
+        # Another thread logged in while this one waited
+        return self._proxy_session_request(method, req_params, session_id)
+
+    def _proxy_session_request(self, method, req_params, session_id):
+        '''Make a request through the proxy with the FAS session of
+        :attr:`username`.
+        '''
+        new_session_id, data = self._proxy_send(
+            method, req_params, {'session_id': session_id})
+        if new_session_id and new_session_id != session_id:
+            self._proxy_session_id = new_session_id
+        return data
+
+    def _proxy_send(self, method, req_params, auth_params):
+        '''Return the session id and data the proxy gets for a request.'''
+        return self.proxy.send_request(
+            method, req_params=req_params, auth_params=auth_params,
+            retries=self.retries, timeout=self.timeout)
+
+    @staticmethod
+    def _map_concurrently(func, items, max_workers):
+        '''Return ``[func(item) for item in items]`` computed by a pool of
+        threads.
+        '''
+        if len(items) <= 1 or max_workers <= 1:
+            return [func(item) for item in items]
+        pool = ThreadPool(min(max_workers, len(items)))
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
 
     def people_query(self, constraints=None, columns=None):
         '''Returns a list of dicts representing database rows
@@ -900,6 +1428,9 @@ class AccountSystem(BaseClient):
     def verify_password(self, username, password):
         '''Return whether the username and password pair are valid.
 
+        Set :attr:`password_cache_size` on the class to remember successful
+        verifications for :attr:`password_cache_ttl` seconds.
+
         :arg username: username to try authenticating
         :arg password: password for the user
         :returns: True if the username/password are valid.  False otherwise.
@@ -908,16 +1439,22 @@ class AccountSystem(BaseClient):
 
     ### fasClient Special Methods ###
 
-    def group_data(self, force_refresh=None):
+    def group_data(self, force_refresh=None, compact=False):
         '''Return administrators/sponsors/users and group type for all groups
 
         :arg force_refresh: If true, the returned data will be queried from the
             database, as opposed to memcached.
+        :kwarg compact: If true, return a :class:`GroupData` instead of
+            a dict.  It takes a fraction of the memory and has
+            :meth:`~GroupData.is_member` and :meth:`~GroupData.groups_of`
+            methods to query it.  Default: False
         :raises AppError: if the query failed on the server
         :returns: A dict mapping group names to the group type and the
             user IDs of the administrator, sponsors, and users of the group.
 
         .. versionadded:: 0.3.8
+        .. versionchanged:: 0.10.1
+            Added the compact kwarg
         '''
         params = {}
         if force_refresh:
@@ -928,6 +1465,8 @@ class AccountSystem(BaseClient):
                 'json/fas_client/group_data',
                 req_params=params, auth=True)
             if request['success']:
+                if compact:
+                    return GroupData(request['data'])
                 return request['data']
             else:
                 raise AppError(
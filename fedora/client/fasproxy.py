@@ -25,9 +25,16 @@
 .. versionadded:: 0.3.17
 '''
 
+import hashlib
+import hmac
+import os
+
+from kitchen.text.converters import to_bytes
+
 from fedora.client import AuthError, AppError
 from fedora.client.proxyclient import ProxyClient
 from fedora import __version__
+from fedora.cacheutils import LRUCache
 
 import logging
 log = logging.getLogger(__name__)
@@ -36,6 +43,11 @@ log = logging.getLogger(__name__)
 class FasProxyClient(ProxyClient):
     '''A threadsafe client to the Fedora Account System.'''
 
+    # Number of PBKDF2 rounds used to hash the credentials remembered by
+    # verify_password().  This needs to be slow enough to make brute forcing
+    # a leaked entry expensive but much faster than a request to FAS.
+    _password_hash_rounds = 10000
+
     def __init__(self, base_url='https://admin.fedoraproject.org/accounts/',
                  *args, **kwargs):
         '''A threadsafe client to the Fedora Account System.
@@ -59,7 +71,22 @@ class FasProxyClient(ProxyClient):
             possible against the `BaseClient`. You might turn this option on
             for testing against a local version of a server with a self-signed
             certificate but it should be off in production.
+        :kwarg password_cache_size: Number of verified credentials that
+            :meth:`verify_password` remembers.  Default: 0, never skip the
+            request to FAS.
+        :kwarg password_cache_ttl: Number of seconds a verified credential is
+            remembered for.  Default: 60
+
+        .. versionchanged:: 0.10.1
+            Added password_cache_size and password_cache_ttl
         '''
+        password_cache_size = kwargs.pop('password_cache_size', 0)
+        password_cache_ttl = kwargs.pop('password_cache_ttl', 60)
+        self._password_cache = None
+        if password_cache_size:
+            self._password_cache = LRUCache(password_cache_size,
+                                            ttl=password_cache_ttl)
+
         if 'useragent' not in kwargs:
             kwargs['useragent'] = 'FAS Proxy Client/%s' % __version__
         if 'session_as_cookie' in kwargs and kwargs['session_as_cookie']:
@@ -116,21 +143,50 @@ class FasProxyClient(ProxyClient):
             raise
         return True
 
+    def _hash_password(self, password, salt):
+        return hashlib.pbkdf2_hmac('sha256', to_bytes(password), salt,
+                                   self._password_hash_rounds)
+
     def verify_password(self, username, password):
         '''Return whether the username and password pair are valid.
 
+        If the client was created with a ``password_cache_size``, a
+        successful verification is remembered for ``password_cache_ttl``
+        seconds and verifying the same credential again during that time
+        does not contact FAS.  Only a salted PBKDF2 hash of the password is
+        kept.  A failed verification forgets what was remembered about the
+        user.
+
         :arg username: username to try authenticating
         :arg password: password for the user
         :returns: True if the username/password are valid.  False otherwise.
+
+        .. versionchanged:: 0.10.1
+            Optionally remember verified credentials
         '''
+        cache = self._password_cache
+        if cache is not None:
+            entry = cache.get(username)
+            if entry is not None:
+                salt, digest = entry
+                if hmac.compare_digest(
+                        digest, self._hash_password(password, salt)):
+                    return True
+
         try:
             self.send_request('/home',
                               auth_params={'username': username,
                                            'password': password})
         except AuthError:
+            if cache is not None:
+                cache.invalidate(username)
             return False
         except:
             raise
+
+        if cache is not None:
+            salt = os.urandom(16)
+            cache[username] = (salt, self._hash_password(password, salt))
         return True
 
     def get_user_info(self, auth_params):
@@ -24,10 +24,10 @@
 '''
 
 import copy
-from hashlib import sha1
 import logging
 # For handling an exception that's coming from requests:
 import ssl
+import threading
 import time
 import warnings
 
@@ -40,9 +40,31 @@ from six.moves.urllib.parse import quote, urljoin, urlparse
 
 from fedora import __version__
 from fedora.client import AppError, AuthError, ServerError
+from fedora.csrfutils import CSRFTokens
 
 log = logging.getLogger(__name__)
 
+# Servers expect the unkeyed token so don't share the keyable
+# fedora.csrfutils.tokens
+_csrf_tokens = CSRFTokens()
+
+try:
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:
+    from cookielib import DefaultCookiePolicy
+
+
+def _new_http_session():
+    '''Return a :class:`requests.Session` that never stores cookies.
+
+    The session is only used for its pool of connections.  The ProxyClient
+    sends the session of each user explicitly so cookies set by one response
+    must not be sent with the requests of other users.
+    '''
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
 
 class ProxyClient(object):
     # pylint: disable-msg=R0903
@@ -107,6 +129,8 @@ class ProxyClient(object):
 
     .. versionchanged:: 0.3.33
         Added the timeout attribute
+    .. versionchanged:: 0.10.1
+        Each thread reuses its HTTP connections to the server
     '''
     log = log
 
@@ -182,8 +206,16 @@ class ProxyClient(object):
             self.timeout = 120.0
         else:
             self.timeout = timeout
+        self._local = threading.local()
         self.log.debug('proxyclient.__init__:exited')
 
+    def _http_session(self):
+        '''Return the pooled :class:`requests.Session` of this thread.'''
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = _new_http_session()
+        return session
+
     def __get_debug(self):
         '''Return whether we have debug logging turned on.
 
@@ -336,8 +368,8 @@ class ProxyClient(object):
         complete_params = req_params or {}
         if session_id:
             # Add the csrf protection token
-            token = sha1(to_bytes(session_id))
-            complete_params.update({'_csrf_token': token.hexdigest()})
+            complete_params.update(
+                {'_csrf_token': _csrf_tokens.token(session_id)})
 
         auth = None
         if username and password:
@@ -376,7 +408,7 @@ class ProxyClient(object):
         num_tries = 0
         while True:
             try:
-                response = requests.post(
+                response = self._http_session().post(
                     url,
                     data=complete_params,
                     cookies=cookies,
@@ -29,18 +29,120 @@ instead: https://www.mediawiki.org/wiki/API:Client_code#Python
 '''
 from __future__ import print_function
 
+from collections import Counter, deque
 from datetime import datetime, timedelta
+from multiprocessing.pool import ThreadPool
+from operator import itemgetter
+import heapq
+import json
+import os
 import time
 import warnings
 
 from kitchen.text.converters import to_bytes
+import six
+from six.moves import range
 
-from fedora.client import BaseClient, AuthError
+from fedora.client import BaseClient, AuthError, ProxyClient
 from fedora import _
 
 MEDIAWIKI_DATEFORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
 
+def count_changes(changes):
+    '''Count wiki changes per user and per page.
+
+    The changes are consumed one by one so only the counts are kept in
+    memory.
+
+    :arg changes: iterable of changes as generated by
+        :meth:`Wiki.iter_recent_changes`
+    :returns: tuple of the number of changes and
+        :class:`collections.Counter` of the changes per user and per page
+
+    .. versionadded:: 0.10.1
+    '''
+    users = Counter()
+    pages = Counter()
+    num_changes = 0
+    for change in changes:
+        num_changes += 1
+        users[change.get('user')] += 1
+        pages[change['title']] += 1
+    return num_changes, users, pages
+
+
+def top_counts(counter, show):
+    '''Return the `show` ``(key, count)`` pairs with the highest counts.
+
+    .. versionadded:: 0.10.1
+    '''
+    return heapq.nlargest(show, six.iteritems(counter), key=itemgetter(1))
+
+
+def _revision_data(page, revision, fields):
+    '''Return the `fields` of a revision returned by the API.'''
+    this_rev = {}
+    if 'flags' in fields:
+        this_rev['minor'] = 'minor' in revision
+    if 'timestamp' in fields:
+        this_rev['time'] = time.strptime(revision['timestamp'],
+                                         MEDIAWIKI_DATEFORMAT)
+    if 'user' in fields:
+        this_rev['user'] = revision['user']
+    if 'size' in fields:
+        this_rev['size'] = revision['size']
+    if 'comment' in fields:
+        this_rev['comment'] = revision.get('comment')
+    if 'content' in fields:
+        this_rev['content'] = revision['content']
+    if 'title' in fields:
+        this_rev['title'] = page['title']
+    return this_rev
+
+
+def _imap_bounded(func, items, max_workers):
+    '''Generate ``(item, func(item))`` for `items` in order.
+
+    Up to `max_workers` calls run at the same time in a pool of threads.
+    Results are only computed ahead of the caller by that many items.
+    '''
+    if max_workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+    pool = ThreadPool(max_workers)
+    running = deque()
+    try:
+        for item in items:
+            running.append((item, pool.apply_async(func, (item,))))
+            if len(running) >= max_workers:
+                item, result = running.popleft()
+                yield item, result.get()
+        while running:
+            item, result = running.popleft()
+            yield item, result.get()
+    finally:
+        pool.terminate()
+
+
+def _load_checkpoint(filename):
+    '''Return the revision id a crawl saved to `filename` or 0.'''
+    try:
+        with open(filename) as checkpoint:
+            return json.load(checkpoint)['next_revid']
+    except (IOError, OSError):
+        return 0
+
+
+def _save_checkpoint(filename, next_revid):
+    '''Atomically record that a crawl has to resume at `next_revid`.'''
+    tmpname = '%s.tmp' % filename
+    with open(tmpname, 'w') as checkpoint:
+        json.dump({'next_revid': next_revid}, checkpoint)
+    os.rename(tmpname, filename)
+
+
 class Wiki(BaseClient):
     api_high_limits = False
 
@@ -53,7 +155,11 @@ class Wiki(BaseClient):
             "org/wiki/API:Client_code#Python")
 
     def get_recent_changes(self, now, then, limit=500):
-        """ Get recent wiki changes from `now` until `then` """
+        """ Get recent wiki changes from `now` until `then`
+
+        Only the first `limit` changes are returned.  Use
+        :meth:`iter_recent_changes` to get all of them.
+        """
         data = self.send_request(
             'api.php', req_params={
                 'list': 'recentchanges',
@@ -67,6 +173,38 @@ class Wiki(BaseClient):
             raise Exception(data['error']['info'])
         return data['query']['recentchanges']
 
+    def iter_recent_changes(self, now, then, limit=500):
+        """ Generate the wiki changes from `now` back to `then`
+
+        The changes are requested `limit` at a time, following the
+        continuation the wiki returns until every change has been seen.
+
+        .. versionadded:: 0.10.1
+        """
+        req_params = {
+            'list': 'recentchanges',
+            'action': 'query',
+            'format': 'json',
+            'rcprop': 'user|title',
+            'rcstart': now.isoformat().split('.')[0] + 'Z',
+            'rcend': then.isoformat().split('.')[0] + 'Z',
+            'rclimit': limit,
+            'continue': '',
+        }
+        while True:
+            data = self.send_request('api.php', req_params=req_params)
+            if 'error' in data:
+                raise Exception(data['error']['info'])
+            for change in data['query']['recentchanges']:
+                yield change
+            if 'continue' in data:
+                req_params.update(data['continue'])
+            elif 'recentchanges' in data.get('query-continue', {}):
+                # MediaWiki < 1.21
+                req_params.update(data['query-continue']['recentchanges'])
+            else:
+                break
+
     def login(self, username, password):
         data = self.send_request('api.php', req_params={
             'action': 'login',
@@ -100,50 +238,20 @@ class Wiki(BaseClient):
         now = datetime.utcnow()
         then = now - timedelta(days=days)
         print(_(u"From %(then)s to %(now)s") % {'then': then, 'now': now})
-        changes = self.get_recent_changes(now=now, then=then)
-        num_changes = len(changes)
+        num_changes, users, pages = count_changes(
+            self.iter_recent_changes(now=now, then=then))
         print(_(u"%d wiki changes in the past week") % num_changes)
-        if num_changes == 500:
-            print(_(
-                u"""Warning: Number of changes reaches the API return limit.
-You will not get the complete list of changes unless
-you run this script using a 'bot' account."""))
-
-        users = {}
-        pages = {}
-        for change in changes:
-            users.setdefault(change['user'], []).append(change['title'])
-            pages[change['title']] = pages.setdefault(change['title'], 0) + 1
 
         print(_(u'\n== Most active wiki users =='))
-        for user, changes in sorted(users.items(),
-                                    key=lambda x: len(x[1]),
-                                    reverse=True)[:show]:
-            print(u' %-50s %d' % (('%s' % user).ljust(50, '.'),
-                                  len(changes)))
+        for user, num in top_counts(users, show):
+            print(u' %-50s %d' % (('%s' % user).ljust(50, '.'), num))
 
         print(_(u'\n== Most edited pages =='))
-        for page, num in sorted(pages.items(),
-                                key=lambda x: x[1],
-                                reverse=True)[:show]:
+        for page, num in top_counts(pages, show):
             print(u' %-50s %d' % (('%s' % page).ljust(50, '.'), num))
 
-    def fetch_all_revisions(self, start=1, flags=True, timestamp=True,
-                            user=True, size=False, comment=True, content=False,
-                            title=True, ignore_imported_revs=True,
-                            ignore_wikibot=False, callback=None):
-        """
-        Fetch data for all revisions. This could take a long time. You can
-        start at a specific revision by modifying the 'start' keyword argument.
-
-        To ignore revisions made by "ImportUser" and "Admin" set
-        ignore_imported_revs to True (this is the default). To ignore edits
-        made by Wikibot set ignore_wikibot to True (False is the default).
-
-        Modifying the remainder of the keyword arguments will return less/more
-        data.
-        """
-        # first we need to get the latest revision id
+    def _latest_revid(self):
+        '''Return the id of the latest revision of the wiki.'''
         change = self.send_request(
             'api.php', req_params={
                 'list': 'recentchanges',
@@ -154,71 +262,147 @@ you run this script using a 'bot' account."""))
                 'rctype': 'edit|new',
             }
         )
-        latest_revid = change['query']['recentchanges'][0]['revid']
-        # now we loop through all the revisions we want
-        rvprop_list = {
-            'flags': flags,
-            'timestamp': timestamp,
-            'user': True,
-            'size': size,
-            'comment': comment,
-            'content': content,
-            'ids': True,
-        }
-        rvprop = '|'.join([key for key in rvprop_list if rvprop_list[key]])
-        revs_to_get = list(range(start, latest_revid))
-        all_revs = {}
+        return change['query']['recentchanges'][0]['revid']
+
+    def _threadsafe_request(self, method, req_params, auth_params):
+        '''Send a request that can run in parallel with others.
+
+        :meth:`BaseClient.send_request` may save a new session id to a file.
+        This goes straight to the threadsafe :class:`ProxyClient` instead.
+        '''
+        return ProxyClient.send_request(
+            self, method, req_params=req_params, auth_params=auth_params,
+            retries=self.retries, timeout=self.timeout)[1]
+
+    def _revision_batches(self, start, end, fields, ignored_users,
+                          max_workers, checkpoint):
+        '''Generate ``(revids, revisions)`` for batches of the revisions from
+        `start` to `end` (excluded) in order.
+
+        `revisions` is a list of ``(revid, revision)`` sorted by revid.  The
+        batches are fetched by up to `max_workers` threads.  If `checkpoint`
+        is set, the first revision id of the next batch is saved to it once
+        the caller is done with a batch.
+        '''
         if self.api_high_limits:
             limit = 500
         else:
             limit = 50
-        for i in range(0, len(revs_to_get), limit):
-            revid_list = revs_to_get[i:i+limit]
-            revid_str = '|'.join([str(rev) for rev in revid_list])
-            data = self.send_request(
-                'api.php', req_params={
+        rvprop = set(['ids', 'user'])
+        rvprop.update(fields.intersection(('flags', 'timestamp', 'size',
+                                           'comment', 'content')))
+        rvprop = '|'.join(sorted(rvprop))
+        auth_params = {}
+        if self.session_id:
+            auth_params['session_id'] = self.session_id
+
+        def fetch(revids):
+            return self._threadsafe_request(
+                'api.php', {
                     'action': 'query',
                     'prop': 'revisions',
                     'rvprop': rvprop,
-                    'revids': revid_str,
+                    'revids': '|'.join([str(rev) for rev in revids]),
                     'format': 'json',
-                }
-            )
-            if 'pages' not in data['query'].keys():
-                continue
-            if 'badrevids' in data['query'].keys():
-                [revs_to_get.remove(i['revid']) for i in
-                 data['query']['badrevids'].values()]
-            for pageid in data['query']['pages']:
-                page = data['query']['pages'][pageid]
+                }, auth_params)
+
+        batches = (range(i, min(i + limit, end))
+                   for i in range(start, end, limit))
+        for revids, data in _imap_bounded(fetch, batches, max_workers):
+            revisions = []
+            for page in data['query'].get('pages', {}).values():
                 for revision in page['revisions']:
-                    if ignore_imported_revs and \
-                       revision['user'] in ['ImportUser', 'Admin'] or \
-                       ignore_wikibot and revision['user'] == 'Wikibot':
-                        revs_to_get.remove(revision['revid'])
+                    if revision['user'] in ignored_users:
                         continue
-                    this_rev = {}
-                    if flags:
-                        this_rev['minor'] = 'minor' in revision.keys()
-                    if timestamp:
-                        this_rev['time'] = time.strptime(revision['timestamp'],
-                                                         MEDIAWIKI_DATEFORMAT)
-                    if user:
-                        this_rev['user'] = revision['user']
-                    if size:
-                        this_rev['size'] = revision['size']
-                    if comment:
-                        if 'comment' in revision.keys():
-                            this_rev['comment'] = revision['comment']
-                        else:
-                            this_rev['comment'] = None
-                    if content:
-                        this_rev['content'] = revision['content']
-                    if title:
-                        this_rev['title'] = page['title']
-                    all_revs[revision['revid']] = this_rev
+                    revisions.append((revision['revid'],
+                                      _revision_data(page, revision, fields)))
+            revisions.sort(key=itemgetter(0))
+            yield revids, revisions
+            if checkpoint:
+                _save_checkpoint(checkpoint, revids[-1] + 1)
+
+    def _revisions_to_fetch(self, start, flags, timestamp, user, size,
+                            comment, content, title, ignore_imported_revs,
+                            ignore_wikibot, max_workers, checkpoint):
+        '''Return the range of revision ids to fetch and a generator of their
+        batches.  See :meth:`_revision_batches`.
+        '''
+        if checkpoint:
+            start = max(start, _load_checkpoint(checkpoint))
+        end = self._latest_revid()
+        fields = set(name for name, wanted in (
+            ('flags', flags), ('timestamp', timestamp), ('user', user),
+            ('size', size), ('comment', comment), ('content', content),
+            ('title', title)) if wanted)
+        ignored_users = set()
+        if ignore_imported_revs:
+            ignored_users.update(('ImportUser', 'Admin'))
+        if ignore_wikibot:
+            ignored_users.add('Wikibot')
+        return range(start, end), self._revision_batches(
+            start, end, fields, ignored_users, max_workers, checkpoint)
+
+    def iter_revisions(self, start=1, flags=True, timestamp=True, user=True,
+                       size=False, comment=True, content=False, title=True,
+                       ignore_imported_revs=True, ignore_wikibot=False,
+                       max_workers=4, checkpoint=None):
+        """
+        Generate ``(revid, revision)`` for all the revisions, in order of
+        revision id.  The keyword arguments are the same as for
+        :meth:`fetch_all_revisions` but the revisions are not kept in memory.
+
+        :kwarg max_workers: Maximum number of requests to make concurrently.
+            Default: 4
+        :kwarg checkpoint: Name of a file recording the progress of the
+            crawl.  If the file exists, the crawl restarts where it stopped.
+            Revisions from the batch being processed when the crawl stopped
+            are generated again.  Default: None, always start at `start`
+
+        .. versionadded:: 0.10.1
+        """
+        batches = self._revisions_to_fetch(
+            start, flags, timestamp, user, size, comment, content, title,
+            ignore_imported_revs, ignore_wikibot, max_workers, checkpoint)[1]
+        for revids, revisions in batches:
+            for revision in revisions:
+                yield revision
+
+    def fetch_all_revisions(self, start=1, flags=True, timestamp=True,
+                            user=True, size=False, comment=True, content=False,
+                            title=True, ignore_imported_revs=True,
+                            ignore_wikibot=False, callback=None,
+                            max_workers=4):
+        """
+        Fetch data for all revisions. This could take a long time. You can
+        start at a specific revision by modifying the 'start' keyword argument.
+
+        To ignore revisions made by "ImportUser" and "Admin" set
+        ignore_imported_revs to True (this is the default). To ignore edits
+        made by Wikibot set ignore_wikibot to True (False is the default).
+
+        Modifying the remainder of the keyword arguments will return less/more
+        data.
+
+        Use :meth:`iter_revisions` to process the revisions as they arrive
+        instead of keeping them all in memory, or to resume an interrupted
+        crawl from a checkpoint.
+
+        .. versionchanged:: 0.10.1
+            Batches are fetched concurrently.  Added the max_workers kwarg
+            (see :meth:`iter_revisions`).  The second argument of the
+            callback is the set of revision ids that haven't been fetched
+            yet.
+        """
+        to_fetch, batches = self._revisions_to_fetch(
+            start, flags, timestamp, user, size, comment, content, title,
+            ignore_imported_revs, ignore_wikibot, max_workers, None)
+        pending = set(to_fetch)
+        all_revs = {}
+        for revids, revisions in batches:
+            all_revs.update(revisions)
+            pending.difference_update(revids)
             if callback:
-                callback(all_revs, revs_to_get)
+                callback(all_revs, pending)
         return all_revs
 
 
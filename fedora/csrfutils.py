@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''
+Computation of the tokens used for :ref:`CSRF-Protection`.
+
+A token is derived from the session id.  By default it is the hex encoded
+SHA1 hash of the session id, which is what the Fedora Account System and
+:class:`fedora.client.ProxyClient` expect.  The tokens are remembered so
+that pages with many links only compute the token once per session.
+
+.. versionadded:: 0.10.1
+'''
+import hashlib
+import hmac
+
+from kitchen.text.converters import to_bytes
+
+
+class CSRFTokens(object):
+    '''Compute and remember the CSRF token of sessions.
+
+    If a :attr:`secret` is set, tokens are HMAC-SHA256 digests keyed with it
+    so that knowing a session id is not enough to forge its token.  Only set
+    a secret on an application whose clients get their token from the
+    application itself (for instance, browsers following generated links).
+    Clients like :class:`fedora.client.ProxyClient` compute the unkeyed SHA1
+    token on their own.
+    '''
+
+    def __init__(self, secret=None, maxsize=4096):
+        '''Create a token service.
+
+        :kwarg secret: Server secret used to key the tokens.  Default: None,
+            tokens are SHA1 hashes of the session id
+        :kwarg maxsize: Number of session tokens to remember.  When more
+            sessions are seen, the remembered tokens are forgotten and
+            computed again when needed.  Default: 4096
+        '''
+        self.maxsize = maxsize
+        self._tokens = {}
+        self.secret = secret
+
+    def _get_secret(self):
+        return self._secret
+
+    def _set_secret(self, secret):
+        self._secret = to_bytes(secret) if secret else None
+        self._tokens = {}
+
+    secret = property(_get_secret, _set_secret,
+                      doc='Key for HMAC tokens or None for SHA1 tokens')
+
+    def token(self, session_id):
+        '''Return the CSRF token for `session_id`.
+
+        :arg session_id: Session id the token protects
+        :returns: hex encoded token.  An empty string if there's no
+            session id.
+        '''
+        if not session_id:
+            return ''
+        tokens = self._tokens
+        try:
+            return tokens[session_id]
+        except KeyError:
+            pass
+
+        if self._secret:
+            token = hmac.new(self._secret, to_bytes(session_id),
+                             hashlib.sha256).hexdigest()
+        else:
+            token = hashlib.sha1(to_bytes(session_id)).hexdigest()
+        if len(tokens) >= self.maxsize:
+            # Tokens are cheap to recompute so don't bother with LRU
+            # bookkeeping on the lookups
+            tokens.clear()
+        tokens[session_id] = token
+        return token
+
+    def check(self, session_id, token):
+        '''Return whether `token` is the CSRF token for `session_id`.
+
+        The comparison takes the same time wherever the tokens differ.
+        '''
+        if not session_id or not token:
+            return False
+        return hmac.compare_digest(to_bytes(self.token(session_id)),
+                                   to_bytes(token))
+
+
+#: The :class:`CSRFTokens` used by the python-fedora web framework helpers.
+#: Set its :attr:`~CSRFTokens.secret` when the application starts to switch
+#: them all to HMAC tokens.
+tokens = CSRFTokens()
+
+
+__all__ = ('CSRFTokens', 'tokens')
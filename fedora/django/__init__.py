@@ -19,23 +19,120 @@
 '''
 .. moduleauthor:: Ignacio Vazquez-Abrams <ivazquez@fedoraproject.org>
 .. moduleauthor:: Toshio Kuratomi <toshio@fedoraproject.org>
+
+.. versionchanged:: 0.10.1
+    :data:`connection` is created the first time it is used.  Lookups made
+    as the FAS_USERNAME service account reuse its FAS session instead of
+    logging in each time.
 '''
-from fedora.client import FasProxyClient
+import threading
+
+from fedora.cacheutils import LRUCache
+from fedora.client import AuthError, FasProxyClient
 
 from django.conf import settings
 
-connection = None
 
-if not connection:
-    connection = FasProxyClient(
-        base_url=settings.FAS_URL, useragent=settings.FAS_USERAGENT
-    )
+class _LazyFasProxyClient(object):
+    '''Create the :class:`~fedora.client.FasProxyClient` on first use.
+
+    Importing :mod:`fedora.django` doesn't require the settings to be
+    configured yet and processes that never talk to FAS don't pay for the
+    client.  Attribute lookups are forwarded to the client, which is
+    threadsafe and keeps a pool of HTTP connections per thread.
+    '''
+
+    def __init__(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                client = self._client
+                if client is None:
+                    client = self._client = FasProxyClient(
+                        base_url=settings.FAS_URL,
+                        useragent=settings.FAS_USERAGENT)
+        return client
+
+    def __getattr__(self, name):
+        return getattr(self._get_client(), name)
+
+
+connection = _LazyFasProxyClient()
+
+
+class _LazyAuthCache(object):
+    '''Create an :class:`~fedora.cacheutils.LRUCache` on first use.
+
+    The cache holds FAS_AUTH_CACHE_SIZE entries (default: 4096) for
+    FAS_AUTH_CACHE_TTL seconds (default: 300).  Like :data:`connection`, the
+    settings are only read when the cache is first used.
+    '''
+
+    def __init__(self):
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def _get_cache(self):
+        cache = self._cache
+        if cache is None:
+            with self._lock:
+                cache = self._cache
+                if cache is None:
+                    cache = self._cache = LRUCache(
+                        getattr(settings, 'FAS_AUTH_CACHE_SIZE', 4096),
+                        ttl=getattr(settings, 'FAS_AUTH_CACHE_TTL', 300))
+        return cache
+
+    def __getattr__(self, name):
+        return getattr(self._get_cache(), name)
+
+
+# FAS session id of the FAS_USERNAME service account
+_service_session = {'id': None}
+_service_lock = threading.Lock()
+
+
+def service_request(method, *args):
+    '''Call a :data:`connection` method as the FAS_USERNAME service account.
+
+    The FAS session of the service account is reused between calls so a
+    lookup is a single request.  If FAS rejects the session (because it
+    expired, for instance), the account logs in again with FAS_PASSWORD.
+
+    :arg method: Name of the :class:`~fedora.client.FasProxyClient` method
+        to call.  It must take the auth_params as its last argument.
+    :arg args: Arguments to the method before the auth_params
+    :returns: the data part of what the method returns
+    :raises fedora.client.AuthError: if FAS_USERNAME and FAS_PASSWORD are
+        not valid
+
+    .. versionadded:: 0.10.1
+    '''
+    func = getattr(connection, method)
+    session_id = _service_session['id']
+    if session_id:
+        try:
+            new_session_id, data = func(*args + ({'session_id': session_id},))
+        except AuthError:
+            with _service_lock:
+                if _service_session['id'] == session_id:
+                    _service_session['id'] = None
+        else:
+            if new_session_id and new_session_id != session_id:
+                _service_session['id'] = new_session_id
+            return data
+
+    new_session_id, data = func(*args + ({
+        'username': settings.FAS_USERNAME,
+        'password': settings.FAS_PASSWORD},))
+    if new_session_id:
+        _service_session['id'] = new_session_id
+    return data
 
 
 def person_by_id(userid):
-    sid, userinfo = connection.person_by_id(
-        userid,
-        {'username': settings.FAS_USERNAME,
-         'password': settings.FAS_PASSWORD}
-    )
-    return userinfo
+    return service_request('person_by_id', userid)
@@ -19,34 +19,55 @@
 '''
 .. moduleauthor:: Ignacio Vazquez-Abrams <ivazquez@fedoraproject.org>
 .. moduleauthor:: Toshio Kuratomi <toshio@fedoraproject.org>
+
+.. versionchanged:: 0.10.1
+    Cache the information FAS returns for a session or a user
 '''
 from fedora.client import AuthError
-from fedora.django import connection, person_by_id
+from fedora.django import _LazyAuthCache, connection, person_by_id
 from fedora.django.auth.models import FasUser
 
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth.backends import ModelBackend
 
+# Information returned by FAS, keyed by ('session', session_id) or
+# ('user', userid).  FAS is only asked again once an entry expires so a
+# logout done in another application is noticed after FAS_AUTH_CACHE_TTL
+# seconds.
+auth_cache = _LazyAuthCache()
+
 
 class FasBackend(ModelBackend):
     def authenticate(self, username=None, password=None,
                      session_id=None):
         try:
             if session_id:
-                auth = {'session_id': session_id}
+                cached = auth_cache.get(('session', session_id))
+                if cached is None:
+                    auth = {'session_id': session_id}
+                    cached = connection.get_user_info(auth_params=auth)
+                    auth_cache.set(('session', session_id), cached)
+                    # FAS may have refreshed the session id
+                    auth_cache.set(('session', cached[0]), cached)
+                session_id, userinfo = cached
             else:
                 auth = {'username': username, 'password': password}
-            session_id, userinfo = connection.get_user_info(auth_params=auth)
+                session_id, userinfo = connection.get_user_info(
+                    auth_params=auth)
             user = FasUser.objects.user_from_fas(userinfo)
             user.session_id = session_id
             if user.is_active:
                 return user
         except AuthError:
-            pass
+            if session_id:
+                auth_cache.invalidate(('session', session_id))
 
     def get_user(self, userid):
         try:
-            userinfo = person_by_id(userid)
+            userinfo = auth_cache.get(('user', userid))
+            if userinfo is None:
+                userinfo = person_by_id(userid)
+                auth_cache.set(('user', userid), userinfo)
             if userinfo:
                 return FasUser.objects.user_from_fas(userinfo)
         except AuthError:
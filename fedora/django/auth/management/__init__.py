@@ -21,6 +21,11 @@
 '''
 from fedora.django.auth import models
 
-from django.db.models.signals import post_syncdb
+try:
+    from django.db.models.signals import post_syncdb
+except ImportError:
+    # Django >= 1.9 dropped syncdb.  Run the fas_sync_groups command instead.
+    post_syncdb = None
 
-post_syncdb.connect(models._syncdb_handler, sender=models)
+if post_syncdb is not None:
+    post_syncdb.connect(models._syncdb_handler, sender=models)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''
+``manage.py fas_sync_groups``: copy the FAS groups to the database.
+
+Run it periodically (from cron, for instance) to pick up the groups created
+or renamed in FAS since ``syncdb``.
+
+.. versionadded:: 0.10.1
+'''
+from optparse import make_option
+
+from fedora.client import AuthError
+from fedora.django.auth.models import GROUP_BATCH_SIZE, import_fas_groups
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Create and rename the Django groups to match the FAS groups'
+
+    if not hasattr(BaseCommand, 'add_arguments'):
+        # Django < 1.8 only reads optparse options from option_list
+        option_list = BaseCommand.option_list + (
+            make_option(
+                '--batch-size', type='int', dest='batch_size',
+                default=GROUP_BATCH_SIZE,
+                help='Number of groups written per query (default: %default)'),
+        )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=GROUP_BATCH_SIZE,
+            help='Number of groups written per query (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        report = None
+        if int(options.get('verbosity', 1)) > 0:
+            report = self.stdout.write
+        try:
+            import_fas_groups(
+                batch_size=options.get('batch_size') or GROUP_BATCH_SIZE,
+                report=report)
+        except AuthError:
+            raise CommandError('Unable to load FAS groups. Did you set'
+                               ' FAS_USERNAME and FAS_PASSWORD?')
@@ -25,11 +25,14 @@
 
 .. versionchanged:: 0.3.26
     Made session cookies httponly
+.. versionchanged:: 0.10.1
+    Don't log the user in again on every request
 '''
 from fedora.client import AuthError
 
 import django
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import (authenticate, login, logout,
+                                 BACKEND_SESSION_KEY, SESSION_KEY)
 from django.contrib.auth.models import AnonymousUser
 
 
@@ -44,11 +47,19 @@ class FasMiddleware(object):
         if sid:
             user = authenticate(session_id=sid)
             if user:
-                try:
-                    login(request, user)
+                if (request.session.get(BACKEND_SESSION_KEY) == user.backend
+                        and str(request.session.get(SESSION_KEY))
+                        == str(user.pk)):
+                    # Already logged in.  login() would only rewrite the
+                    # session and the user's last_login.
+                    request.user = user
                     authenticated = True
-                except AuthError:
-                    pass
+                else:
+                    try:
+                        login(request, user)
+                        authenticated = True
+                    except AuthError:
+                        pass
 
         if not authenticated:
             # Hack around misthought out djiblits/django interaction;
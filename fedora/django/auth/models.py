@@ -21,14 +21,19 @@
 .. moduleauthor:: Toshio Kuratomi <toshio@fedoraproject.org>
 '''
 from __future__ import print_function
+import logging
+import time
+
 from fedora.client import AuthError
-from fedora.django import connection, person_by_id
+from fedora.django import _LazyAuthCache, person_by_id, service_request
 from fedora import _
 
 import django.contrib.auth.models as authmodels
 from django.conf import settings
 import six
 
+log = logging.getLogger('fedora.django.auth')
+
 # Map FAS user elements to model attributes
 _fasmap = {
     'id': 'id',
@@ -36,33 +41,148 @@ _fasmap = {
     'email': 'email',
 }
 
+# Fingerprints of the FAS records last written to the database, keyed by user
+# id.  Lets user_from_fas() skip the writes when nothing changed.
+_user_fingerprints = _LazyAuthCache()
 
-def _new_group(group):
-    try:
-        g = authmodels.Group.objects.get(id=group['id'])
-    except authmodels.Group.DoesNotExist:
-        g = authmodels.Group(id=group['id'])
-    g.name = group['name']
-    g.save()
-    return g
+# FAS human_name of the users, keyed by user id.  Used when the name isn't
+# stored in the first_name and last_name fields or may have been truncated.
+_human_names = _LazyAuthCache()
+
+
+def _name_lengths():
+    '''Return the max_length of the first_name and last_name fields.'''
+    meta = authmodels.User._meta
+    return (meta.get_field('first_name').max_length,
+            meta.get_field('last_name').max_length)
+
+
+def _split_name(human_name):
+    '''Split a FAS human_name between the first_name and last_name fields.
+
+    The name is cut at the first space so that :attr:`FasUser.name` can join
+    the two fields back together.  Parts longer than the fields are
+    truncated.
+    '''
+    first, _sep, last = (human_name or '').strip().partition(' ')
+    first_length, last_length = _name_lengths()
+    return first[:first_length], last.strip()[:last_length]
+
+
+def _fingerprint(user, admin):
+    '''Return what user_from_fas() stores about a FAS user.'''
+    return (tuple(user[k] for k in sorted(_fasmap)), user.get('human_name'),
+            user['status'], admin,
+            frozenset((g['id'], g['name'])
+                      for g in user['approved_memberships']))
+
+
+#: Number of groups written per query by :func:`import_fas_groups`
+GROUP_BATCH_SIZE = 500
+
+
+def _apply_groups(names, existing, batch_size=GROUP_BATCH_SIZE):
+    '''Create and rename database groups to match FAS.
+
+    :arg names: dict mapping FAS group ids to their FAS name
+    :arg existing: dict mapping the ids of the database groups among `names`
+        to their name
+    :kwarg batch_size: Number of groups written per query
+    :returns: tuple of the number of groups created and renamed
+    '''
+    manager = authmodels.Group.objects
+    new = [authmodels.Group(id=gid, name=name)
+           for gid, name in six.iteritems(names) if gid not in existing]
+    renamed = [authmodels.Group(id=gid, name=name)
+               for gid, name in six.iteritems(names)
+               if gid in existing and existing[gid] != name]
+    if new:
+        manager.bulk_create(new, batch_size=batch_size)
+    if renamed:
+        if hasattr(manager, 'bulk_update'):
+            manager.bulk_update(renamed, ['name'], batch_size=batch_size)
+        else:
+            # Django < 2.2
+            for group in renamed:
+                manager.filter(id=group.id).update(name=group.name)
+    return len(new), len(renamed)
+
+
+def _sync_groups(groups):
+    '''Make sure the FAS `groups` exist in the database with their FAS name.
+
+    Uses a constant number of queries.
+
+    :arg groups: iterable of FAS group dicts with ``id`` and ``name`` keys
+    :returns: list of the ids of `groups`
+
+    .. versionadded:: 0.10.1
+    '''
+    names = dict((g['id'], g['name']) for g in groups)
+    if not names:
+        return []
+    existing = dict(authmodels.Group.objects.filter(
+        id__in=list(names)).values_list('id', 'name'))
+    _apply_groups(names, existing)
+    return list(names)
+
+
+def _quiet(message):
+    pass
+
+
+def import_fas_groups(batch_size=GROUP_BATCH_SIZE, report=None):
+    '''Copy every FAS group to the database.
+
+    The group list is fetched from FAS once and compared with the existing
+    groups in a single query.  Missing groups are then created and renamed
+    groups updated in batches of `batch_size`.  Groups are never deleted.
+
+    :kwarg batch_size: Number of groups written per query.  Default:
+        :data:`GROUP_BATCH_SIZE`
+    :kwarg report: Callable taking a progress message.  Default: None, don't
+        report progress
+    :raises fedora.client.AuthError: if FAS_USERNAME and FAS_PASSWORD are
+        not valid
+    :returns: dict with the number of groups in FAS (``total``) and the
+        number ``created`` and ``renamed`` in the database, as well as the
+        seconds spent fetching from FAS (``fetch_time``) and writing to the
+        database (``db_time``)
+
+    .. versionadded:: 0.10.1
+    '''
+    if report is None:
+        report = _quiet
+
+    report(_('Loading FAS groups...'))
+    started = time.time()
+    gl = service_request('group_list')
+    names = dict((g['id'], g['name']) for g in gl['groups'])
+    fetched = time.time()
+    report(_('Fetched %(total)s groups from FAS in %(seconds).2fs') % {
+        'total': len(names), 'seconds': fetched - started})
+
+    existing = dict(authmodels.Group.objects.values_list('id', 'name'))
+    created, renamed = _apply_groups(names, existing, batch_size)
+    written = time.time()
+    report(_('Created %(created)s and renamed %(renamed)s groups in'
+             ' %(seconds).2fs') % {'created': created, 'renamed': renamed,
+                                   'seconds': written - fetched})
+    return {'total': len(names), 'created': created, 'renamed': renamed,
+            'fetch_time': fetched - started, 'db_time': written - fetched}
 
 
 def _syncdb_handler(sender, **kwargs):
     # Import FAS groups
     verbosity = kwargs.get('verbosity', 1)
-    if verbosity > 0:
-        print(_('Loading FAS groups...'))
+    report = print if verbosity > 0 else None
     try:
-        gl = connection.group_list({'username': settings.FAS_USERNAME,
-                                    'password': settings.FAS_PASSWORD})
+        import_fas_groups(report=report)
     except AuthError:
         if verbosity > 0:
             print(_('Unable to load FAS groups. Did you set '
                     'FAS_USERNAME and FAS_PASSWORD?'))
     else:
-        groups = gl[1]['groups']
-        for group in groups:
-            _new_group(group)
         if verbosity > 0:
             print(_('FAS groups loaded. Don\'t forget to set '
                     'FAS_USERNAME and FAS_PASSWORD to a low-privilege '
@@ -74,63 +194,78 @@ class FasUserManager(authmodels.UserManager):
         """
         Creates a user in the table based on the structure returned
         by FAS
+
+        .. versionchanged:: 0.10.1
+            The database is only written to when the FAS record changed
+            since it was last stored by this process.  Group memberships are
+            synchronized with a constant number of queries.  The human_name
+            is stored in the first_name and last_name fields.
         """
-        log = open('/var/tmp/django.log', 'a')
-        log.write('in models user_from_fas\n')
-        log.close()
+        log.debug('user_from_fas: %s', user['username'])
+        _human_names.set(user['id'], user.get('human_name'))
+        admin = (user['username'] in
+                 getattr(settings, 'FAS_ADMINS', ()))
+        fingerprint = _fingerprint(user, admin)
+        if _user_fingerprints.get(user['id']) == fingerprint:
+            try:
+                return self.get(id=user['id'])
+            except FasUser.DoesNotExist:
+                pass
+
         d = {}
         for k, v in six.iteritems(_fasmap):
             d[v] = user[k]
         u = FasUser(**d)
+        u.first_name, u.last_name = _split_name(user.get('human_name'))
         u.set_unusable_password()
         u.is_active = user['status'] == 'active'
-        admin = (user['username'] in
-                 getattr(settings, 'FAS_ADMINS', ()))
         u.is_staff = admin
         u.is_superuser = admin
         if getattr(settings, 'FAS_GENERICEMAIL', True):
             u.email = u._get_email()
         u.save()
-        known_groups = []
-        for group in u.groups.values():
-            known_groups.append(group['id'])
-
-        fas_groups = []
-        for group in user['approved_memberships']:
-            fas_groups.append(group['id'])
-
-        # This user has been added to one or more FAS groups
-        for group in (g for g in user['approved_memberships']
-                      if g['id'] not in known_groups):
-            newgroup = _new_group(group)
-            u.groups.add(newgroup)
-
-        # This user has been removed from one or more FAS groups
-        for gid in known_groups:
-            found = False
-            for g in user['approved_memberships']:
-                if g['id'] == gid:
-                    found = True
-                    break
-            if not found:
-                u.groups.remove(authmodels.Group.objects.get(id=gid))
 
-        u.save()
+        fas_groups = frozenset(_sync_groups(user['approved_memberships']))
+        known_groups = frozenset(u.groups.values_list('id', flat=True))
+        # Groups the user has been added to or removed from in FAS
+        added = fas_groups - known_groups
+        if added:
+            u.groups.add(*added)
+        removed = known_groups - fas_groups
+        if removed:
+            u.groups.remove(*removed)
+
+        _user_fingerprints.set(user['id'], fingerprint)
         return u
 
 
 class FasUser(authmodels.User):
     def _get_name(self):
-        log = open('/var/tmp/django.log', 'a')
-        log.write('in models _get_name\n')
-        log.close()
+        '''Return the FAS human_name of the user.
+
+        .. versionchanged:: 0.10.1
+            Read the name stored in first_name and last_name by
+            :meth:`FasUserManager.user_from_fas` instead of asking FAS on
+            every access.  Names that are missing (rows stored by older
+            versions) or that may have been truncated are looked up in FAS
+            and cached for FAS_AUTH_CACHE_TTL seconds.
+        '''
+        first_length, last_length = _name_lengths()
+        if self.first_name and len(self.first_name) < first_length \
+                and len(self.last_name) < last_length:
+            return ' '.join(
+                name for name in (self.first_name, self.last_name) if name)
+
+        name = _human_names.get(self.id, _human_names)
+        if name is not _human_names:
+            return name
+        log.debug('Looking up the FAS name of user %s', self.id)
         userinfo = person_by_id(self.id)
-        return userinfo['human_name']
+        name = userinfo['human_name'] if userinfo else None
+        _human_names.set(self.id, name)
+        return name
 
     def _get_email(self):
-        log = open('/var/tmp/django.log', 'a')
-        log.write('in models _get_email\n')
-        log.close()
         return '%s@fedoraproject.org' % self.username
 
     name = property(_get_name)
@@ -138,9 +273,7 @@ class FasUser(authmodels.User):
     objects = FasUserManager()
 
     def get_full_name(self):
-        log = open('/var/tmp/django.log', 'a')
-        log.write('in models get_full_name\n')
-        log.close()
-        if self.name:
-            return self.name.strip()
+        name = self.name
+        if name:
+            return name.strip()
         return self.username.strip()
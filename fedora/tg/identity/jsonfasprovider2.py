@@ -28,7 +28,6 @@ System using JSON calls.
 '''
 
 import crypt
-from hashlib import sha1
 
 import six
 from turbogears import config, identity
@@ -37,6 +36,8 @@ import cherrypy
 from kitchen.pycompat24 import sets
 from kitchen.text.converters import to_bytes
 
+from fedora.csrfutils import tokens as csrf_tokens
+
 sets.add_builtin_set()
 
 from fedora.client import (
@@ -207,9 +208,9 @@ class JsonFasIdentity(BaseClient):
             if not (self.username and self.password):
                 # Unless we were given the user_name and password to login on
                 # this request, a CSRF token is required
-                if (not '_csrf_token' in cherrypy.request.params or
-                        cherrypy.request.params['_csrf_token'] !=
-                        sha1(self.visit_key).hexdigest()):
+                if not csrf_tokens.check(
+                        self.visit_key,
+                        cherrypy.request.params.get('_csrf_token')):
                     self.log.info("Bad _csrf_token")
                     if '_csrf_token' in cherrypy.request.params:
                         self.log.info("visit: %s token: %s" % (
@@ -243,7 +244,7 @@ class JsonFasIdentity(BaseClient):
     def _get_token(self):
         '''Get the csrf token for this identity'''
         if self.visit_key:
-            return sha1(self.visit_key).hexdigest()
+            return csrf_tokens.token(self.visit_key)
         else:
             return ''
     csrf_token = property(_get_token)
@@ -31,11 +31,6 @@ csrf attacks.
 '''
 from datetime import datetime
 
-try:
-    from hashlib import sha1 as hash_constructor
-except ImportError:
-    from sha import new as hash_constructor
-
 
 from sqlobject import SQLObject, SQLObjectNotFound, RelatedJoin, \
         DateTimeCol, IntCol, StringCol, UnicodeCol
@@ -53,6 +48,8 @@ from turbogears.util import load_class
 from turbogears.identity import set_login_attempted
 from turbojson.jsonify import jsonify_sqlobject, jsonify
 
+from fedora.csrfutils import tokens as csrf_tokens
+
 hub = PackageHub("turbogears.identity")
 __connection__ = hub
 
@@ -149,9 +146,9 @@ class SqlObjectCsrfIdentity(object):
         else:
             # Unless we were given the user_name and password to login on
             # this request, a CSRF token is required
-            if (not '_csrf_token' in cherrypy.request.params or
-                    cherrypy.request.params['_csrf_token'] !=
-                    hash_constructor(self.visit_key).hexdigest()):
+            if not csrf_tokens.check(
+                    self.visit_key,
+                    cherrypy.request.params.get('_csrf_token')):
                 log.info("Bad _csrf_token")
                 if '_csrf_token' in cherrypy.request.params:
                     log.info("visit: %s token: %s" % (self.visit_key,
@@ -173,7 +170,7 @@ class SqlObjectCsrfIdentity(object):
     def _get_token(self):
         '''Get the csrf token for this identity'''
         if self.visit_key:
-            return hash_constructor(self.visit_key).hexdigest()
+            return csrf_tokens.token(self.visit_key)
         else:
             return ''
     csrf_token = property(_get_token)
@@ -32,31 +32,131 @@ Miscellaneous functions of use on a TurboGears Server
 .. moduleauthor:: Toshio Kuratomi <tkuratom@redhat.com>
 .. moduleauthor:: Ricky Zhou <ricky@fedoraproject.org>
 '''
-from itertools import chain
-import cgi
 import os
 
 import cherrypy
 from cherrypy import request
 from decorator import decorator
-import pkg_resources
 import turbogears
 from turbogears import flash, redirect, config, identity
 import turbogears.util as tg_util
 from turbogears.controllers import check_app_root
 from turbogears.identity.exceptions import RequestRequiredException
 import six
-from six.moves.urllib.parse import urlencode, urlparse, urlunparse
+from six.moves.urllib.parse import parse_qsl, quote_plus, urlparse, urlunparse
+
+import fedora
+from fedora import _fedora_dir
 
 
 # Save this for people who need the original url() function
 tg_url = turbogears.url
 
+# Number of entries kept in the caches used by url().  They are keyed by the
+# paths and parameters of links so they must be bounded.
+_URL_CACHE_SIZE = 4096
+_split_cache = {}
+_quote_cache = {}
+# Template paths returned by fedora_template()
+_template_cache = {}
+
 
 def add_custom_stdvars(new_vars):
     return new_vars.update({'fedora_template': fedora_template})
 
 
+def _url_prefix():
+    '''Return what :func:`url` prepends to absolute paths.
+
+    The prefix is made of the :attr:`server.webpath`, :envvar:`SCRIPT_NAME`,
+    and the approot of the application.  It is computed once per request.
+    '''
+    if not tg_util.request_available():
+        return (config.get('server.webpath') or '').rstrip('/')
+
+    try:
+        return request._fedora_url_prefix
+    except AttributeError:
+        pass
+
+    webpath = (config.get('server.webpath') or '').rstrip('/')
+    check_app_root()
+    try:
+        webpath += request.wsgi_environ['SCRIPT_NAME'].rstrip('/')
+    except (AttributeError, KeyError):  # pylint: disable-msg=W0704
+        # :W0704: Lack of wsgi environ is fine... we still have
+        # server.webpath
+        pass
+    request._fedora_url_prefix = webpath + request.app_root
+    return request._fedora_url_prefix
+
+
+def _quote_param(key, value):
+    '''Return the ``key=value`` query string fragment for a parameter.
+
+    This is what :func:`urllib.urlencode` produces for the pair with
+    ``doseq=True``.  `value` must already be a byte :class:`str`.
+    '''
+    if not isinstance(key, six.string_types):
+        # Keys like 1 and True are equal but are not quoted the same
+        return '%s=%s' % (quote_plus(str(key)), quote_plus(value))
+    try:
+        return _quote_cache[(key, value)]
+    except KeyError:
+        pass
+    quoted = '%s=%s' % (quote_plus(str(key)), quote_plus(value))
+    if len(_quote_cache) >= _URL_CACHE_SIZE:
+        _quote_cache.clear()
+    _quote_cache[(key, value)] = quoted
+    return quoted
+
+
+def _add_query_params(args, query_params):
+    '''Quote `query_params` the way :func:`url` does and add them to `args`.
+    '''
+    for key, value in query_params:
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            values = value
+        else:
+            values = (value,)
+        for value in values:
+            if value is None:
+                continue
+            if isinstance(value, unicode):
+                value = value.encode('utf8')
+            args.append(_quote_param(key, str(value)))
+
+
+def _split_url(tgpath):
+    '''Split `tgpath` for :func:`url`.
+
+    :returns: a tuple of the url up to the query string, a tuple of the
+        quoted parameters of the query string except ``_csrf_token``, and the
+        fragment (including the ``#``)
+    '''
+    try:
+        return _split_cache[tgpath]
+    except KeyError:
+        pass
+
+    scheme, netloc, path, params, query_s, fragment = urlparse(tgpath)
+    base = urlunparse((scheme, netloc, path, params, '', ''))
+    args = []
+    if query_s:
+        _add_query_params(args, (p for p in parse_qsl(query_s)
+                                 if p[0] != '_csrf_token'))
+    if fragment:
+        fragment = '#' + fragment
+    split = (base, tuple(args), fragment)
+
+    if len(_split_cache) >= _URL_CACHE_SIZE:
+        _split_cache.clear()
+    _split_cache[tgpath] = split
+    return split
+
+
 def url(tgpath, tgparams=None, **kwargs):
     '''Computes URLs.
 
@@ -78,6 +178,10 @@ def url(tgpath, tgparams=None, **kwargs):
 
     .. versionadded:: 0.3.10
        Modified from turbogears.controllers.url for :ref:`CSRF-Protection`
+
+    .. versionchanged:: 0.10.1
+       The prefix is computed once per request and the parsed form of paths
+       and quoted parameters are cached.  The urls are the same as before.
     '''
     if not isinstance(tgpath, six.string_types):
         tgpath = '/'.join(list(tgpath))
@@ -86,18 +190,7 @@ def url(tgpath, tgparams=None, **kwargs):
         # This function is primarily used in redirect() calls, so this prevents
         # covert redirects and thus CSRF leaking.
         tgpath = '/'
-    if tgpath.startswith('/'):
-        webpath = (config.get('server.webpath') or '').rstrip('/')
-        if tg_util.request_available():
-            check_app_root()
-            tgpath = request.app_root + tgpath
-            try:
-                webpath += request.wsgi_environ['SCRIPT_NAME'].rstrip('/')
-            except (AttributeError, KeyError):  # pylint: disable-msg=W0704
-                # :W0704: Lack of wsgi environ is fine... we still have
-                # server.webpath
-                pass
-        tgpath = webpath + tgpath
+    tgpath = _url_prefix() + tgpath
     if tgparams is None:
         tgparams = kwargs
     else:
@@ -107,39 +200,23 @@ def url(tgpath, tgparams=None, **kwargs):
         except AttributeError:
             raise TypeError(
                 'url() expects a dictionary for query parameters')
-    args = []
     # Add the _csrf_token
     try:
-        if identity.current.csrf_token:
-            tgparams.update({'_csrf_token': identity.current.csrf_token})
+        csrf_token = identity.current.csrf_token
+        if csrf_token:
+            tgparams.update({'_csrf_token': csrf_token})
     except RequestRequiredException:  # pylint: disable-msg=W0704
         # :W0704: If we are outside of a request (called from non-controller
         # methods/ templates) just don't set the _csrf_token.
         pass
 
-    # Check for query params in the current url
-    query_params = six.iteritems(tgparams)
-    scheme, netloc, path, params, query_s, fragment = urlparse(tgpath)
-    if query_s:
-        query_params = chain((p for p in cgi.parse_qsl(query_s) if p[0] !=
-                              '_csrf_token'), query_params)
-
-    for key, value in query_params:
-        if value is None:
-            continue
-        if isinstance(value, (list, tuple)):
-            pairs = [(key, v) for v in value]
-        else:
-            pairs = [(key, value)]
-        for key, value in pairs:
-            if value is None:
-                continue
-            if isinstance(value, unicode):
-                value = value.encode('utf8')
-            args.append((key, str(value)))
-    query_string = urlencode(args, True)
-    tgpath = urlunparse((scheme, netloc, path, params, query_string, fragment))
-    return tgpath
+    # Query params in the current url come first
+    base, args, fragment = _split_url(tgpath)
+    args = list(args)
+    _add_query_params(args, six.iteritems(tgparams))
+    if args:
+        return '%s?%s%s' % (base, '&'.join(args), fragment)
+    return base + fragment
 
 
 # this is taken from turbogears 1.1 branch
@@ -422,12 +499,18 @@ def fedora_template(template, template_type='genshi'):
     :kwarg template_type: template language we need the template written in
         Defaults to 'genshi'
     :returns: filesystem path to the template
+
+    .. versionchanged:: 0.10.1
+        The path is computed once per template
     '''
-    # :E1101: pkg_resources does have resource_filename
-    # pylint: disable-msg=E1101
-    return pkg_resources.resource_filename(
-        'fedora', os.path.join('tg',
-                               'templates', template_type, template))
+    try:
+        return _template_cache[(template, template_type)]
+    except KeyError:
+        pass
+    path = os.path.join(_fedora_dir(), 'tg', 'templates', template_type,
+                        template)
+    _template_cache[(template, template_type)] = path
+    return path
 
 __all__ = (
     'add_custom_stdvars', 'absolute_url', 'enable_csrf',
@@ -28,22 +28,25 @@ Miscellaneous functions of use on a TurboGears 2 Server
 '''
 
 from copy import copy
-from hashlib import sha1
 import logging
 import os
 
 from munch import Munch
 from kitchen.text.converters import to_unicode
-import pkg_resources
 from repoze.what.plugins.pylonshq import booleanize_predicates
 import tg
 from tg import config
 
+from fedora import _fedora_dir
+from fedora.csrfutils import tokens as csrf_tokens
 from fedora.wsgi.faswho import make_faswho_middleware
 from fedora.urlutils import update_qs
 
 tg_url = tg.url
 
+# Template paths returned by fedora_template()
+_template_cache = {}
+
 ### FIXME: Need jsonify_validation_errors, json_or_redirect, request_format
 # To have all of the functions that exist for TG1
 
@@ -74,7 +77,7 @@ def url(*args, **kwargs):
     else:
         session_id = tg.request.environ.get('CSRF_AUTH_SESSION_ID')
         if session_id:
-            csrf_token = sha1(session_id).hexdigest()
+            csrf_token = csrf_tokens.token(session_id)
     if csrf_token:
         new_url = update_qs(new_url, {'_csrf_token': csrf_token},
                             overwrite=True)
@@ -94,19 +97,20 @@ def fedora_template(template, template_type='mako', dotted_lookup=True):
     .. versionchanged:: 0.3.25
         Added dotted_lookup
         Made this work with tg2
+    .. versionchanged:: 0.10.1
+        The result is computed once per set of arguments
     '''
-    # :E1101: pkg_resources does have resource_filename
-    # pylint: disable-msg=E1101
-    resource = pkg_resources.resource_filename(
-        'fedora', os.path.join('tg2',
-                               'templates', template_type, template)
-    )
+    key = (template, template_type, dotted_lookup)
+    try:
+        return _template_cache[key]
+    except KeyError:
+        pass
 
-    # pylint: enable-msg=E1101
+    # Find the location of the base resource (fedora)
+    base = _fedora_dir()
+    resource = os.path.join(base, 'tg2', 'templates', template_type, template)
 
     if dotted_lookup:
-        # Find the location of the base resource (fedora)
-        base = pkg_resources.resource_filename('fedora', '')
         if resource.startswith(base):
             # subtract that from the resource
             resource = resource[len(base):]
@@ -121,6 +125,7 @@ def fedora_template(template, template_type='mako', dotted_lookup=True):
         resource = to_unicode(resource)
         resource = resource.translate({ord(u'/'): u'.'})
 
+    _template_cache[key] = resource
     return resource
 
 
@@ -27,7 +27,66 @@ Functions to manipulate urls.
 
 
 from kitchen.iterutils import isiterable
-from six.moves.urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+import six
+from six.moves.urllib.parse import (parse_qs, quote_plus, urlencode, urlparse,
+                                    urlunparse)
+
+# Number of entries kept by _parse_uri() and _encode_param()
+_CACHE_SIZE = 4096
+_parse_cache = {}
+_encode_cache = {}
+
+
+def _encode_param(key, value):
+    '''Return `key` and `value` urlencoded the way :func:`update_qs` does.'''
+    if isiterable(value):
+        return urlencode([(key, item) for item in value])
+    if not isinstance(value, (six.text_type, six.binary_type)):
+        # Values like 1 and True are equal but are not encoded the same
+        return urlencode([(key, value)])
+
+    try:
+        return _encode_cache[(key, value)]
+    except KeyError:
+        pass
+    encoded = urlencode([(key, value)])
+    if len(_encode_cache) >= _CACHE_SIZE:
+        _encode_cache.clear()
+    _encode_cache[(key, value)] = encoded
+    return encoded
+
+
+def _parse_uri(uri):
+    '''Split `uri` for :func:`update_qs`.
+
+    :returns: a tuple of the uri up to the query string, the fragment part
+        (including the ``#``) and a tuple of ``(key, encoded)`` pairs where
+        `encoded` holds all of the key's parameters urlencoded
+    '''
+    try:
+        return _parse_cache[uri]
+    except KeyError:
+        pass
+
+    loc = urlparse(uri)
+    base = urlunparse(loc[:4] + ('', ''))
+    fragment = ''
+    if loc[5]:
+        fragment = '#' + loc[5]
+    segments = []
+    for key, values in parse_qs(loc[4]).items():
+        # parse_qs() only returns strings so they can be quoted directly
+        quoted = quote_plus(key)
+        segments.append((key, '&'.join(
+            ['%s=%s' % (quoted, quote_plus(value)) for value in values])))
+    segments = tuple(segments)
+    parsed = (base, fragment, segments)
+
+    if len(_parse_cache) >= _CACHE_SIZE:
+        # Entries are cheap to recreate so don't bother with LRU bookkeeping
+        _parse_cache.clear()
+    _parse_cache[uri] = parsed
+    return parsed
 
 
 def update_qs(uri, new_params, overwrite=True):
@@ -43,48 +102,34 @@ def update_qs(uri, new_params, overwrite=True):
         query parameters will be appended to a list with the old parameters at
         the start of the list.
     :returns: URI with the new parameters added.
+
+    .. versionchanged:: 0.10.1
+        The parsed form of recently seen URIs is cached and only the new
+        parameters are encoded.  This makes adding a parameter to many links
+        (like a CSRF token) much faster.
     '''
-    loc = list(urlparse(uri))
-    query_dict = parse_qs(loc[4])
-    if overwrite:
-        # Overwrite any existing values with the new values
-        query_dict.update(new_params)
-    else:
-        # Add new values in addition to the existing parameters
-        # For every new entry
-        for key in new_params:
-            # If the entry already is present
-            if key in query_dict:
-                if isiterable(new_params[key]):
-                    # If the new entry is a non-string iterable
-                    try:
-                        # Try to add the new values to the existing entry
-                        query_dict[key].extend(new_params[key])
-                    except AttributeError:
-                        # Existing value wasn't a list, make it one
-                        query_dict[key] = [query_dict[key], new_params[key]]
-                else:
-                    # The new entry is a scalar, so try to append it
-                    try:
-                        query_dict[key].append(new_params[key])
-                    except AttributeError:
-                        # Existing value wasn't a list, make it one
-                        query_dict[key] = [query_dict[key], new_params[key]]
-            else:
-                # No previous entry, just set to the new entry
-                query_dict[key] = new_params[key]
-
-    # seems that we have to sanitize a bit here
-    query_list = []
-    for key, value in query_dict.items():
-        if isiterable(value):
-            for item in value:
-                query_list.append((key, item))
-            continue
-        query_list.append((key, value))
-
-    loc[4] = urlencode(query_list)
-
-    return urlunparse(loc)
+    base, fragment, segments = _parse_uri(uri)
+    query_list = list(segments)
+    positions = dict((key, idx) for idx, (key, _) in enumerate(query_list))
+
+    for key, value in dict(new_params).items():
+        encoded = _encode_param(key, value)
+        if key not in positions:
+            # No previous entry, just set to the new entry
+            positions[key] = len(query_list)
+            query_list.append((key, encoded))
+        elif overwrite:
+            # Overwrite any existing values with the new values
+            query_list[positions[key]] = (key, encoded)
+        elif encoded:
+            # Add new values in addition to the existing parameters
+            idx = positions[key]
+            query_list[idx] = (key, '&'.join(
+                [e for e in (query_list[idx][1], encoded) if e]))
+
+    query = '&'.join([encoded for _, encoded in query_list if encoded])
+    if query:
+        return '%s?%s%s' % (base, query, fragment)
+    return base + fragment
 
 __all__ = ['update_qs']
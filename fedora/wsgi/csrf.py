@@ -27,14 +27,16 @@ http://en.wikipedia.org/wiki/Cross-site_request_forgery
 .. moduleauthor:: Luke Macken <lmacken@redhat.com>
 
 .. versionadded:: 0.3.17
+.. versionchanged:: 0.10.1
+    The request is parsed once and shared with the faswho plugin through
+    :func:`fedora.wsgi.utils.get_request`
 '''
 
-from hashlib import sha1
 import logging
 
 from munch import Munch
-from kitchen.text.converters import to_bytes
-from webob import Request
+from kitchen.text.converters import to_bytes, to_unicode
+from six.moves.urllib.parse import unquote_plus
 try:
     # webob > 1.0
     from webob.headers import ResponseHeaders
@@ -46,11 +48,43 @@ from paste.response import replace_header
 from repoze.who.interfaces import IMetadataProvider
 from zope.interface import implements
 
+from fedora.csrfutils import tokens as csrf_tokens
 from fedora.urlutils import update_qs
+from fedora.wsgi.utils import get_request
 
 log = logging.getLogger(__name__)
 
 
+def _pop_query_param(query_string, name):
+    '''Remove a parameter from a raw query string.
+
+    The query string is scanned once and the other parameters are kept
+    exactly as they were sent.  Only the names containing a ``%`` are
+    decoded before being compared with `name`.
+
+    :arg query_string: The QUERY_STRING of a request
+    :arg name: Name of the parameter to remove
+    :returns: a tuple of the decoded value of the last `name` parameter (None
+        if there was no such parameter) and the query string without any
+        `name` parameters
+    '''
+    if name not in query_string and '%' not in query_string:
+        return None, query_string
+
+    value = None
+    kept = []
+    for param in query_string.split('&'):
+        key, _sep, param_value = param.partition('=')
+        if key == name or ('%' in key and unquote_plus(key) == name):
+            value = param_value
+        else:
+            kept.append(param)
+
+    if value is None:
+        return None, query_string
+    return to_unicode(unquote_plus(value)), '&'.join(kept)
+
+
 class CSRFProtectionMiddleware(object):
     '''
     CSRF Protection WSGI Middleware.
@@ -129,7 +163,7 @@ class CSRFProtectionMiddleware(object):
         does not match, or if a token is not provided, it will remove the
         user from the ``environ``, based on the ``clear_env`` setting.
         '''
-        request = Request(environ)
+        request = get_request(environ)
         log.debug('CSRFProtectionMiddleware(%(r_path)s)' %
                   {'r_path': to_bytes(request.path)})
 
@@ -238,7 +272,7 @@ class CSRFMetadataProvider(object):
         return path
 
     def add_metadata(self, environ, identity):
-        request = Request(environ)
+        request = get_request(environ)
         log.debug('CSRFMetadataProvider.add_metadata(%(r_path)s)'
                   % {'r_path': to_bytes(request.path)})
 
@@ -250,7 +284,7 @@ class CSRFMetadataProvider(object):
 
         if session_id and session_id != 'Set-Cookie:':
             environ[self.auth_session_id] = session_id
-            token = sha1(session_id).hexdigest()
+            token = csrf_tokens.token(session_id)
             identity.update({self.csrf_token_id: token})
             log.debug('Identity updated with CSRF token')
             path = self.strip_script(environ, request.path)
@@ -287,16 +321,17 @@ class CSRFMetadataProvider(object):
     def extract_csrf_token(self, request):
         '''Extract and remove the CSRF token from a given
         :class:`webob.Request`
-        '''
-        csrf_token = None
 
-        if self.csrf_token_id in request.GET:
+        .. versionchanged:: 0.10.1
+            The token is removed from the raw query string.  The other
+            parameters are no longer decoded and re-joined.
+        '''
+        csrf_token, query_string = _pop_query_param(request.query_string,
+                                                    self.csrf_token_id)
+        if csrf_token is not None:
             log.debug("%(token)s in GET" % {'token':
                                             to_bytes(self.csrf_token_id)})
-            csrf_token = request.GET[self.csrf_token_id]
-            del(request.GET[self.csrf_token_id])
-            request.query_string = '&'.join(['%s=%s' % (k, v) for k, v in
-                                             request.GET.items()])
+            request.query_string = query_string
 
         if self.csrf_token_id in request.POST:
             log.debug("%(token)s in POST" % {'token':
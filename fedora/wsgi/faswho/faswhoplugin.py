@@ -28,14 +28,21 @@ repoze.who plugin to authenticate against hte Fedora Account System
     - Added secure and httponly as optional attributes to the session cookie
     - Removed too-aggressive caching (wouldn't detect logout from another app)
     - Added ability to authenticate and request a page in one request
+.. versionchanged:: 0.10.1
+    - Replaced the Beaker cache with a bounded per-plugin cache keyed by
+      session id that :meth:`FASWhoPlugin.identify` consults before FAS
+    - Metadata plugins are found with :mod:`importlib.metadata` and loaded
+      the first time they are needed
+    - The request is parsed once and shared with the CSRF components through
+      :func:`fedora.wsgi.utils.get_request`
+    - :meth:`FASWhoPlugin.authenticate` trusts sessions found in the cache
+      instead of checking them with FAS again
 '''
 import os
 import sys
 import logging
+import threading
 
-import pkg_resources
-
-from beaker.cache import Cache
 from munch import Munch
 from kitchen.text.converters import to_bytes, exception_to_bytes
 from paste.httpexceptions import HTTPFound
@@ -45,26 +52,71 @@ from repoze.who.classifiers import default_challenge_decider
 from repoze.who.interfaces import IChallenger, IIdentifier
 from repoze.who.plugins.basicauth import BasicAuthPlugin
 from repoze.who.plugins.friendlyform import FriendlyFormPlugin
-from paste.request import parse_dict_querystring, parse_formvars
 from six.moves.urllib.parse import quote_plus
-import webob
 
 from fedora.client import AuthError
 from fedora.client.fasproxy import FasProxyClient
+from fedora.cacheutils import LRUCache
 from fedora.wsgi.csrf import CSRFMetadataProvider, CSRFProtectionMiddleware
+from fedora.wsgi.utils import get_request
 
 log = logging.getLogger(__name__)
 
+METADATA_PLUGIN_GROUP = 'fas.repoze.who.metadata_plugins'
+
 FAS_URL = 'https://admin.fedoraproject.org/accounts/'
 FAS_CACHE_TIMEOUT = 900  # 15 minutes (FAS visits timeout after 20)
+FAS_CACHE_SIZE = 4096
+
+
+_metadata_plugins = None
+_metadata_plugins_lock = threading.Lock()
+
+
+def _iter_entry_points(group):
+    '''Return the entry points registered for `group`.'''
+    try:
+        from importlib import metadata
+    except ImportError:
+        try:
+            import importlib_metadata as metadata
+        except ImportError:
+            metadata = None
+
+    if metadata is None:
+        # python2 without the importlib_metadata backport
+        import pkg_resources
+        return list(pkg_resources.iter_entry_points(group))
+
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        return list(entry_points.select(group=group))
+    # python < 3.10 returns a dict of groups
+    return list(entry_points.get(group, ()))
+
 
-fas_cache = Cache('fas_repozewho_cache', type='memory')
+def load_metadata_plugins():
+    '''Return the metadata plugins registered by installed packages.
+
+    The plugins are found and loaded the first time this is called.  Later
+    calls return the same list.
+
+    .. versionadded:: 0.10.1
+    '''
+    global _metadata_plugins
+    if _metadata_plugins is None:
+        with _metadata_plugins_lock:
+            if _metadata_plugins is None:
+                _metadata_plugins = [
+                    entry.load()
+                    for entry in _iter_entry_points(METADATA_PLUGIN_GROUP)]
+    return _metadata_plugins
 
 
 def fas_request_classifier(environ):
     classifier = default_request_classifier(environ)
     if classifier == 'browser':
-        request = webob.Request(environ)
+        request = get_request(environ)
         if not request.accept.best_match(
                 ['application/xhtml+xml', 'text/html']):
             classifier = 'app'
@@ -77,7 +129,8 @@ def make_faswho_middleware(
         login_form_url='/login',
         logout_handler='/logout_handler',
         post_login_url='/post_login', post_logout_url=None, fas_url=FAS_URL,
-        insecure=False, ssl_cookie=True, httponly=True):
+        insecure=False, ssl_cookie=True, httponly=True,
+        cache_size=FAS_CACHE_SIZE, cache_ttl=FAS_CACHE_TIMEOUT, cache=None):
     '''
     :arg app: WSGI app that is being wrapped
     :kwarg log_stream: :class:`logging.Logger` to log auth messages
@@ -98,6 +151,15 @@ def make_faswho_middleware(
         using the session cookie to pass information to JavaScript clients but
         also prevents XSS attacks from stealing the session cookie
         information.
+    :kwarg cache_size: Maximum number of sessions whose user information is
+        kept in memory.  See :class:`FASWhoPlugin`
+    :kwarg cache_ttl: Number of seconds the user information for a session is
+        trusted without asking FAS.  See :class:`FASWhoPlugin`
+    :kwarg cache: Cache object to store the user information in instead of
+        a per-process cache.  See :class:`FASWhoPlugin`
+
+    .. versionchanged:: 0.10.1
+        Added cache_size, cache_ttl, and cache
     '''
 
     # Because of the way we override values (via a dict in AppConfig), we
@@ -108,7 +170,8 @@ def make_faswho_middleware(
             'log_stream must be set when calling make_fasauth_middleware()')
 
     faswho = FASWhoPlugin(fas_url, insecure=insecure, ssl_cookie=ssl_cookie,
-                          httponly=httponly)
+                          httponly=httponly, cache_size=cache_size,
+                          cache_ttl=cache_ttl, cache=cache)
     csrf_mdprovider = CSRFMetadataProvider()
 
     form = FriendlyFormPlugin(login_form_url,
@@ -152,33 +215,91 @@ def make_faswho_middleware(
 
 
 class FASWhoPlugin(object):
+    '''repoze.who identifier, authenticator, and metadata provider for FAS.
+
+    The user information retrieved from FAS is cached in memory, keyed by
+    the FAS session id.  Requests carrying a session cookie that's in the
+    cache are identified without contacting FAS.  At most `cache_size`
+    sessions are kept and each is trusted for `cache_ttl` seconds.  That
+    means a logout or password change done through another application is
+    only noticed once the entry expires.  Applications that know about such
+    a change can call :meth:`invalidate` to drop the entries at once.  Set
+    `cache_ttl` to 0 to ask FAS on every request.
+
+    By default each process has its own cache.  To share the cached
+    information between all the workers on a host, pass a
+    :class:`fedora.cacheutils.SQLiteCache` as `cache`::
+
+        from fedora.cacheutils import SQLiteCache
+        cache = SQLiteCache(maxsize=10000, ttl=FAS_CACHE_TIMEOUT)
+        app = make_faswho_middleware(app, log_stream, cache=cache)
+
+    Any object with the same ``get``, ``set``, ``invalidate``, and ``items``
+    methods can be used.  The cache is available as :attr:`cache`, and its
+    ``hits`` and ``misses`` attributes tell how often FAS was avoided.
+
+    .. versionchanged:: 0.10.1
+        Added the identity cache and the cache_size, cache_ttl, and cache
+        kwargs
+    '''
 
     def __init__(self, url, insecure=False, session_cookie='tg-visit',
-                 ssl_cookie=True, httponly=True):
+                 ssl_cookie=True, httponly=True, cache_size=FAS_CACHE_SIZE,
+                 cache_ttl=FAS_CACHE_TIMEOUT, cache=None):
         self.url = url
         self.insecure = insecure
         self.fas = FasProxyClient(url, insecure=insecure)
         self.session_cookie = session_cookie
         self.ssl_cookie = ssl_cookie
         self.httponly = httponly
-        self._session_cache = {}
-        self._metadata_plugins = []
-
-        for entry in pkg_resources.iter_entry_points(
-                'fas.repoze.who.metadata_plugins'):
-            self._metadata_plugins.append(entry.load())
+        if cache is None:
+            cache = LRUCache(cache_size, ttl=cache_ttl)
+        self.cache = cache
+        # Loaded on first use so that creating the plugin stays cheap
+        self._metadata_plugins = None
+
+    def invalidate(self, session_id=None, username=None):
+        '''Forget the cached user information.
+
+        Call this when a session is known to have ended or a user's
+        credentials have changed (for instance, after a password change) so
+        that the next request goes to FAS again.
+
+        :kwarg session_id: Forget the information cached for this session
+        :kwarg username: Forget the information cached for every session of
+            this user
+        '''
+        if session_id:
+            self.cache.invalidate(session_id)
+        if username:
+            for cached_id, user_data in self.cache.items():
+                if user_data[1]['username'] == username:
+                    self.cache.invalidate(cached_id)
+
+    def _cached_user_info(self, environ, session_id):
+        '''Return user information for `session_id`, from the cache if
+        possible.
+        '''
+        user_data = self.cache.get(session_id)
+        if user_data is None:
+            user_data = self._retrieve_user_info(
+                environ, auth_params={'session_id': session_id})
+        return user_data
 
     def _retrieve_user_info(self, environ, auth_params=None):
         ''' Retrieve information from fas and cache the results.
 
-            We need to retrieve the user fresh every time because we need to
-            know that the password hasn't changed or the session_id hasn't
-            been invalidated by the user logging out.
+            The results are cached under the session id that FAS returns.
         '''
         if not auth_params:
             return None
 
-        user_data = self.fas.get_user_info(auth_params)
+        try:
+            user_data = self.fas.get_user_info(auth_params)
+        except AuthError:
+            # The session is no longer valid
+            self.invalidate(session_id=auth_params.get('session_id'))
+            raise
 
         if not user_data:
             self.forget(environ, None)
@@ -206,8 +327,9 @@ class FASWhoPlugin(object):
 
         user_data[1]['groups'] = groups
         # If we have information on the user, cache it for later
-        fas_cache.set_value(user_data[1]['username'], user_data,
-                            expiretime=FAS_CACHE_TIMEOUT)
+        if auth_params.get('session_id') not in (None, user_data[0]):
+            self.invalidate(session_id=auth_params['session_id'])
+        self.cache.set(user_data[0], user_data)
         return user_data
 
     def identify(self, environ):
@@ -222,7 +344,7 @@ class FASWhoPlugin(object):
         if not 'repoze.who.logins' in environ:
             environ['repoze.who.logins'] = 0
 
-        req = webob.Request(environ, charset='utf-8')
+        req = get_request(environ)
         cookie = req.cookies.get(self.session_cookie)
 
         # This is compatible with TG1 and it gives us a way to authenticate
@@ -251,9 +373,7 @@ class FASWhoPlugin(object):
         log.info('Request identify for cookie %(cookie)s' %
                  {'cookie': to_bytes(cookie)})
         try:
-            user_data = self._retrieve_user_info(
-                environ,
-                auth_params={'session_id': cookie})
+            user_data = self._cached_user_info(environ, cookie)
         except Exception as e:  # pylint:disable-msg=W0703
             # For any exceptions, returning None means we failed to identify
             log.warning(e)
@@ -265,17 +385,26 @@ class FASWhoPlugin(object):
         # Preauthenticated
         identity = {'repoze.who.userid': user_data[1]['username'],
                     'login': user_data[1]['username'],
-                    'password': user_data[1]['password']}
+                    'password': user_data[1].get('password'),
+                    'session_id': user_data[0]}
         return identity
 
+    def _session_id(self, environ, identity):
+        '''Find the FAS session id for the current request.'''
+        session_id = None
+        if identity:
+            session_id = identity.get('session_id')
+        if not session_id:
+            session_id = get_request(environ).cookies.get(
+                self.session_cookie)
+        return session_id
+
     def remember(self, environ, identity):
         log.info('In remember()')
         result = []
 
-        user_data = fas_cache.get_value(identity['login'])
-        try:
-            session_id = user_data[0]
-        except Exception:
+        session_id = self._session_id(environ, identity)
+        if not session_id:
             return None
 
         set_cookie = ['%s=%s; Path=/;' % (self.session_cookie, session_id)]
@@ -291,19 +420,17 @@ class FASWhoPlugin(object):
         log.info('In forget()')
         # return a expires Set-Cookie header
 
-        user_data = fas_cache.get_value(identity['login'])
-        try:
-            session_id = user_data[0]
-        except Exception:
+        session_id = self._session_id(environ, identity)
+        if not session_id:
             return None
 
         log.info('Forgetting login data for cookie %(s_id)s' %
                  {'s_id': to_bytes(session_id)})
 
+        self.invalidate(session_id=session_id)
         self.fas.logout(session_id)
 
         result = []
-        fas_cache.remove_value(key=identity['login'])
         expired = '%s=\'\'; Path=/; Expires=Sun, 10-May-1971 11:59:00 GMT'\
                   % self.session_cookie
         result.append(('Set-Cookie', expired))
@@ -329,37 +456,46 @@ class FASWhoPlugin(object):
             err_goto = sn + err_goto
             default_came_from = sn + default_came_from
 
-        query = parse_dict_querystring(environ)
-        form = parse_formvars(environ)
-        form.update(query)
-        came_from = form.get('came_from', default_came_from)
+        # Query string values take precedence over the form body
+        came_from = get_request(environ).params.get('came_from',
+                                                    default_came_from)
 
-        try:
-            auth_params = {'username': identity['login'],
-                           'password': identity['password']}
-        except KeyError:
+        # Sessions that identify() already found in the cache don't need to
+        # be checked with FAS again
+        user_data = None
+        if identity.get('session_id'):
+            user_data = self.cache.get(identity['session_id'])
+
+        if user_data is None:
             try:
-                auth_params = {'session_id': identity['session_id']}
-            except:
-                # On error we return None which means that auth failed
-                set_error('Parameters for authenticating not found')
-                return None
+                auth_params = {'username': identity['login'],
+                               'password': identity['password']}
+            except KeyError:
+                try:
+                    auth_params = {'session_id': identity['session_id']}
+                except:
+                    # On error we return None which means that auth failed
+                    set_error('Parameters for authenticating not found')
+                    return None
 
-        try:
-            user_data = self._retrieve_user_info(environ, auth_params)
-        except AuthError as e:
-            set_error('Authentication failed: %s' % exception_to_bytes(e))
-            log.warning(e)
-            return None
-        except Exception as e:
-            set_error('Unknown auth failure: %s' % exception_to_bytes(e))
-            return None
+            try:
+                user_data = self._retrieve_user_info(environ, auth_params)
+            except AuthError as e:
+                set_error('Authentication failed: %s' % exception_to_bytes(e))
+                log.warning(e)
+                return None
+            except Exception as e:
+                set_error('Unknown auth failure: %s' % exception_to_bytes(e))
+                return None
 
         if user_data:
             try:
-                del user_data[1]['password']
+                # The record may be shared through the cache so work on a copy
+                user_info = dict(user_data[1])
+                user_info.pop('password', None)
+                identity['session_id'] = user_data[0]
                 environ['CSRF_AUTH_SESSION_ID'] = user_data[0]
-                return user_data[1]['username']
+                return user_info['username']
             except ValueError:
                 set_error('user information from fas not in expected format!')
                 return None
@@ -376,16 +512,26 @@ class FASWhoPlugin(object):
             log.info('Error exists in session, no need to set metadata')
             return 'error'
 
+        if self._metadata_plugins is None:
+            self._metadata_plugins = load_metadata_plugins()
+
         plugin_user_info = {}
         for plugin in self._metadata_plugins:
             plugin(plugin_user_info)
         identity.update(plugin_user_info)
         del plugin_user_info
 
-        user = identity.get('repoze.who.userid')
-        (session_id, user_info) = fas_cache.get_value(
-            key=user,
-            expiretime=FAS_CACHE_TIMEOUT)
+        user_data = None
+        session_id = self._session_id(environ, identity)
+        if session_id:
+            try:
+                user_data = self._cached_user_info(environ, session_id)
+            except Exception as e:  # pylint:disable-msg=W0703
+                log.warning(e)
+        if not user_data:
+            log.info('No user information for this session')
+            return 'error'
+        (session_id, user_info) = user_data
 
         #### FIXME: Deprecate this line!!!
         # If we make a new version of fas.who middleware, get rid of saving
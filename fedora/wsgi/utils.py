@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018  Red Hat, Inc.
+# This file is part of python-fedora
+#
+# python-fedora is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# python-fedora is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with python-fedora; if not, see <http://www.gnu.org/licenses/>
+#
+'''
+Utilities shared by the python-fedora WSGI components.
+
+.. versionadded:: 0.10.1
+'''
+import webob
+
+#: environ key holding the request returned by :func:`get_request`
+REQUEST_ENV_KEY = 'fedora.wsgi.request'
+
+
+def get_request(environ):
+    '''Return the :class:`webob.Request` for this WSGI request.
+
+    The request is created the first time this is called and stored in the
+    `environ` so that the faswho and CSRF middleware and plugins share it.
+    Its query string, form body, and cookies are therefore only parsed once
+    and changes one component makes to ``GET`` or ``POST`` are seen by the
+    others.
+
+    :arg environ: WSGI environ of the current request
+    :returns: a :class:`webob.Request` wrapping `environ`
+    '''
+    request = environ.get(REQUEST_ENV_KEY)
+    # Some middleware hand a copy of the environ down the stack.  The request
+    # must wrap the environ the caller is working with.
+    if request is None or request.environ is not environ:
+        request = webob.Request(environ, charset='utf-8')
+        environ[REQUEST_ENV_KEY] = request
+    return request
+
+
+__all__ = ('REQUEST_ENV_KEY', 'get_request')
@@ -25,10 +25,20 @@ FAS-OpenID authentication plugin for the flask web framework
 .. moduleauthor:: Patrick Uiterwijk <puiterwijk@fedoraproject.org>
 
 ..versionadded:: 0.3.33
+
+.. versionchanged:: 0.10.1
+    The :attr:`flask.g.fas_user` object is built once per login instead of
+    on every request.  Each request gets a shallow copy so the entries of
+    ``approved_memberships`` must be treated as read-only.  OpenID
+    associations are kept in a :class:`CacheOpenIDStore` so that logins are
+    verified locally.  The user's information can be kept server side with
+    only a token in the session.
 '''
 from functools import wraps
 
+import binascii
 import logging
+import os
 import time
 from munch import Munch
 import flask
@@ -37,13 +47,19 @@ try:
 except ImportError:
     from flask import _request_ctx_stack as stack
 
+from openid.association import Association
 from openid.consumer import consumer
 from openid.fetchers import setDefaultFetcher, Urllib2Fetcher
 from openid.extensions import pape, sreg, ax
+from openid.store import nonce
+from openid.store.interface import OpenIDStore
 from openid_cla import cla
 from openid_teams import teams
 
 import six
+
+from fedora.cacheutils import LRUCache
+
 log = logging.getLogger(__name__)
 
 
@@ -82,11 +98,109 @@ class FASJSONEncoder(flask.json.JSONEncoder):
         return flask.json.JSONEncoder.default(self, o)
 
 
+class CacheOpenIDStore(OpenIDStore):
+    '''An OpenID store keeping associations and nonces in a cache.
+
+    With an association store, python-openid verifies the signature of the
+    provider's assertions itself instead of asking the provider to check them
+    (an extra round trip for every login).  The associations and nonces are
+    stored in a cache from :mod:`fedora.cacheutils` and expire with the
+    association or the nonce's validity window:
+
+    * :class:`~fedora.cacheutils.LRUCache` (the default) keeps them in
+      process with a bounded size.  Workers that don't know an association
+      fall back to asking the provider.
+    * :class:`~fedora.cacheutils.SQLiteCache` shares them between all the
+      workers of the host.
+
+    Nonces are checked then recorded without a lock between the workers so
+    a replay racing the original assertion on another worker is not
+    detected.  The response is still bound to the session that started the
+    login.
+
+    .. versionadded:: 0.10.1
+    '''
+
+    def __init__(self, cache=None):
+        ''' Create a store.
+
+        :kwarg cache: Cache to hold the associations and nonces.  Default: an
+            :class:`~fedora.cacheutils.LRUCache` of 1024 entries
+        '''
+        if cache is None:
+            cache = LRUCache(1024)
+        self.cache = cache
+
+    @staticmethod
+    def _assoc_key(server_url, handle=None):
+        if handle is None:
+            return 'openid-assoc %s' % server_url
+        return 'openid-assoc %s %s' % (server_url, handle)
+
+    def storeAssociation(self, server_url, association):
+        ttl = association.expiresIn
+        if ttl <= 0:
+            return
+        serialized = association.serialize()
+        self.cache.set(self._assoc_key(server_url, association.handle),
+                       serialized, ttl=ttl)
+        # The most recent association is used for new logins
+        self.cache.set(self._assoc_key(server_url), serialized, ttl=ttl)
+
+    def getAssociation(self, server_url, handle=None):
+        serialized = self.cache.get(self._assoc_key(server_url, handle))
+        if serialized is None:
+            return None
+        association = Association.deserialize(serialized)
+        if association.expiresIn <= 0:
+            return None
+        return association
+
+    def removeAssociation(self, server_url, handle):
+        key = self._assoc_key(server_url, handle)
+        found = self.cache.get(key) is not None
+        self.cache.invalidate(key)
+        latest = self.getAssociation(server_url)
+        if latest is not None and latest.handle == handle:
+            self.cache.invalidate(self._assoc_key(server_url))
+        return found
+
+    def useNonce(self, server_url, timestamp, salt):
+        if abs(timestamp - time.time()) > nonce.SKEW:
+            return False
+        key = 'openid-nonce %s %s %s' % (server_url, timestamp, salt)
+        if key in self.cache:
+            return False
+        self.cache.set(key, True, ttl=nonce.SKEW)
+        return True
+
+    def cleanupNonces(self):
+        # Expired entries are dropped by the cache
+        return 0
+
+    def cleanupAssociations(self):
+        return 0
+
+
+def _build_user(user):
+    ''' Return the :attr:`flask.g.fas_user` object for a session's user. '''
+    fas_user = Munch.fromDict(user)
+    fas_user.groups = frozenset(user['groups'])
+    # Add approved_memberships to provide backwards compatibility
+    # New applications should only use g.fas_user.groups
+    fas_user.approved_memberships = [Munch(name=group)
+                                     for group in user['groups']]
+    return fas_user
+
+
 class FAS(object):
     """ The Flask plugin. """
 
     def __init__(self, app=None):
         self.postlogin_func = None
+        self._users = None
+        self.store = None
+        self.user_store = None
         self.app = app
         if self.app is not None:
             self.init_app(app)
@@ -97,6 +211,17 @@ class FAS(object):
         app.config.setdefault('FAS_OPENID_ENDPOINT',
                               'https://id.fedoraproject.org/openid/')
         app.config.setdefault('FAS_OPENID_CHECK_CERT', True)
+        app.config.setdefault('FAS_OPENID_USER_CACHE_SIZE', 1024)
+        self._users = LRUCache(app.config['FAS_OPENID_USER_CACHE_SIZE'])
+        app.config.setdefault('FAS_OPENID_STORE', None)
+        self.store = app.config['FAS_OPENID_STORE']
+        if self.store is None:
+            self.store = CacheOpenIDStore()
+        elif self.store is False:
+            # Explicitly stateless
+            self.store = None
+        app.config.setdefault('FAS_OPENID_USER_STORE', None)
+        self.user_store = app.config['FAS_OPENID_USER_STORE']
 
         if not self.app.config['FAS_OPENID_CHECK_CERT']:
             setDefaultFetcher(Urllib2Fetcher())
@@ -133,7 +258,7 @@ class FAS(object):
         return_url = flask.session.get('FLASK_FAS_OPENID_RETURN_URL', None)
         cancel_url = flask.session.get('FLASK_FAS_OPENID_CANCEL_URL', None)
         base_url = self.normalize_url(flask.request.base_url)
-        oidconsumer = consumer.Consumer(flask.session, None)
+        oidconsumer = consumer.Consumer(flask.session, self.store)
         info = oidconsumer.complete(flask.request.values, base_url)
         display_identifier = info.getDisplayIdentifier()
 
@@ -182,8 +307,17 @@ class FAS(object):
                         user['ssh_key'] = ssh_keys
                 user['gpg_keyid'] = ax_resp.get(
                     'http://fedoauth.org/openid/schema/GPG/keyid')
-            flask.session['FLASK_FAS_OPENID_USER'] = user
+            session_user = user
+            if self.user_store is not None:
+                # Only keep a token in the session
+                token = binascii.hexlify(os.urandom(16)).decode('ascii')
+                ttl = self.app.permanent_session_lifetime
+                self.user_store.set(self._user_store_key(token), user,
+                                    ttl=ttl.days * 86400 + ttl.seconds)
+                session_user = {'token': token}
+            flask.session['FLASK_FAS_OPENID_USER'] = session_user
             flask.session.modified = True
+            self._users.set(self._user_key(session_user), _build_user(user))
             if self.postlogin_func is not None:
                 self._check_session()
                 return self.postlogin_func(return_url)
@@ -192,21 +326,60 @@ class FAS(object):
         else:
             return 'Strange state: %s' % info.status
 
+    @staticmethod
+    def _user_store_key(token):
+        ''' Return the key of a session token in the user store. '''
+        return 'fas-openid-user %s' % token
+
+    @staticmethod
+    def _user_key(user):
+        ''' Return the key identifying a login in the user cache. '''
+        if 'token' in user:
+            return user['token']
+        return (user['username'], user.get('login_time'))
+
+    def _get_fas_user(self, user):
+        ''' Return the cached :attr:`flask.g.fas_user` of a session's user.
+
+        The user store is the authority on which session tokens are valid so
+        it is checked on every request, even when the user object is cached.
+        That way a logout done by another worker is honoured at once.
+
+        :returns: the user object or None if a session token is not in the
+            user store any more
+        '''
+        key = self._user_key(user)
+        if 'token' in user:
+            stored = None
+            if self.user_store is not None:
+                stored = self.user_store.get(self._user_store_key(key))
+            if stored is None:
+                self._users.invalidate(key)
+                return None
+            user = stored
+        fas_user = self._users.get(key)
+        if fas_user is None:
+            fas_user = _build_user(user)
+            self._users.set(key, fas_user)
+        return fas_user
+
     def _check_session(self):
-        if 'FLASK_FAS_OPENID_USER' not in flask.session \
-                or flask.session['FLASK_FAS_OPENID_USER'] is None:
+        user = flask.session.get('FLASK_FAS_OPENID_USER')
+        fas_user = None
+        if user is not None:
+            fas_user = self._get_fas_user(user)
+        if fas_user is None:
             flask.g.fas_user = None
         else:
-            user = flask.session['FLASK_FAS_OPENID_USER']
-            # Add approved_memberships to provide backwards compatibility
-            # New applications should only use g.fas_user.groups
-            user['approved_memberships'] = []
-            for group in user['groups']:
-                membership = dict()
-                membership['name'] = group
-                user['approved_memberships'].append(Munch.fromDict(membership))
-            flask.g.fas_user = Munch.fromDict(user)
-            flask.g.fas_user.groups = frozenset(flask.g.fas_user.groups)
+            # Copy so that changes a request makes to g.fas_user don't leak
+            # into the following requests.  groups is a frozenset and the
+            # other values are immutable so only the list needs copying.
+            # The Munch in approved_memberships are shared and must be
+            # treated as read-only.
+            fas_user = Munch(fas_user)
+            fas_user.approved_memberships = list(
+                fas_user.approved_memberships)
+            flask.g.fas_user = fas_user
         flask.g.fas_session_id = 0
 
     def _check_safe_root(self, url):
@@ -246,7 +419,7 @@ class FAS(object):
         return_url = (self._check_safe_root(return_url) or
                       flask.request.url_root)
         session = {}
-        oidconsumer = consumer.Consumer(session, None)
+        oidconsumer = consumer.Consumer(session, self.store)
         try:
             request = oidconsumer.begin(self.app.config['FAS_OPENID_ENDPOINT'])
         except consumer.DiscoveryFailure as exc:
@@ -299,6 +472,12 @@ class FAS(object):
     def logout(self):
         '''Logout the user associated with this session
         '''
+        user = flask.session.get('FLASK_FAS_OPENID_USER')
+        if user and 'token' in user:
+            self._users.invalidate(user['token'])
+            if self.user_store is not None:
+                self.user_store.invalidate(
+                    self._user_store_key(user['token']))
         flask.session['FLASK_FAS_OPENID_USER'] = None
         flask.g.fas_session_id = None
         flask.g.fas_user = None
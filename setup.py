@@ -32,7 +32,7 @@ setup(
     ],
     extras_require={
         'tg': ['TurboGears >= 1.0.4', 'SQLAlchemy', 'decorator'],
-        'wsgi': ['repoze.who', 'Beaker', 'Paste'],
+        'wsgi': ['repoze.who', 'Paste'],
         'flask': [
             'Flask', 'Flask_WTF', 'python-openid', 'python-openid-teams',
             'python-openid-cla',
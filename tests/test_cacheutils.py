@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+""" Test the caches. """
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from fedora.cacheutils import LRUCache, NullCache, SQLiteCache
+from fedora.client import UnsafeFileError
+
+
+class FakeTimer(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = LRUCache(maxsize=2)
+        cache['foo'] = 1
+        self.assertEqual(cache.get('foo'), 1)
+        self.assertEqual(cache['foo'], 1)
+        self.assertEqual(cache.get('bar'), None)
+        self.assertRaises(KeyError, lambda: cache['bar'])
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache['foo'] = 1
+        cache['bar'] = 2
+        # Touch foo so that bar is the oldest entry
+        cache.get('foo')
+        cache['baz'] = 3
+        self.assertTrue('foo' in cache)
+        self.assertFalse('bar' in cache)
+        self.assertTrue('baz' in cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        timer = FakeTimer()
+        cache = LRUCache(ttl=10, timer=timer)
+        cache['foo'] = 1
+        cache.set('bar', 2, ttl=None)
+        timer.now = 9
+        self.assertEqual(cache.get('foo'), 1)
+        timer.now = 10
+        self.assertEqual(cache.get('foo'), None)
+        self.assertFalse('foo' in cache)
+        self.assertEqual(cache.get('bar'), 2)
+
+    def test_invalidate(self):
+        cache = LRUCache()
+        cache['foo'] = 1
+        cache.invalidate('foo')
+        cache.invalidate('bar')
+        self.assertFalse('foo' in cache)
+        cache['foo'] = 1
+        del cache['foo']
+        self.assertFalse('foo' in cache)
+        cache['foo'] = 1
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_bad_maxsize(self):
+        self.assertRaises(ValueError, LRUCache, maxsize=0)
+
+    def test_items(self):
+        timer = FakeTimer()
+        cache = LRUCache(ttl=10, timer=timer)
+        cache['foo'] = 1
+        timer.now = 5
+        cache['bar'] = 2
+        timer.now = 12
+        self.assertEqual(cache.items(), [('bar', 2)])
+
+
+class TestNullCache(unittest.TestCase):
+    def test_stores_nothing(self):
+        cache = NullCache()
+        cache.set('a', 1)
+        cache['b'] = 2
+        self.assertEqual(cache.get('a', 'default'), 'default')
+        self.assertFalse('b' in cache)
+        self.assertRaises(KeyError, cache.__getitem__, 'b')
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.items(), [])
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(cache.hit_rate, 0.0)
+
+
+class TestSQLiteCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'cache.sqlite')
+        self.timer = FakeTimer()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shared_between_instances(self):
+        cache = SQLiteCache(self.filename, timer=self.timer)
+        cache['foo'] = {'groups': set(['packager'])}
+        other = SQLiteCache(self.filename, timer=self.timer)
+        self.assertEqual(other.get('foo'), {'groups': set(['packager'])})
+        self.assertEqual(other.get('bar'), None)
+        self.assertEqual(other.hit_rate, 0.5)
+        other.invalidate('foo')
+        self.assertFalse('foo' in cache)
+
+    def test_evicts_oldest(self):
+        cache = SQLiteCache(self.filename, maxsize=2, timer=self.timer)
+        for num in range(3):
+            self.timer.now = num
+            cache[str(num)] = num
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(sorted(cache.items()), [('1', 1), ('2', 2)])
+
+    def test_ttl(self):
+        cache = SQLiteCache(self.filename, ttl=10, timer=self.timer)
+        cache['foo'] = 1
+        self.timer.now = 10
+        self.assertEqual(cache.get('foo'), None)
+        self.assertEqual(cache.items(), [])
+        self.assertEqual(len(cache), 0)
+
+    def test_file_permissions(self):
+        SQLiteCache(self.filename)
+        self.assertEqual(os.stat(self.filename).st_mode & 0o077, 0)
+        os.chmod(self.filename, 0o666)
+        self.assertRaises(UnsafeFileError, SQLiteCache, self.filename)
+        os.chmod(self.filename, 0o620)
+        self.assertRaises(UnsafeFileError, SQLiteCache, self.filename)
+
+    def test_symlink_rejected(self):
+        target = os.path.join(self.tmpdir, 'target')
+        os.symlink(target, self.filename)
+        self.assertRaises(UnsafeFileError, SQLiteCache, self.filename)
+        self.assertFalse(os.path.exists(target))
+
+    @unittest.skipUnless(os.getuid() == 0, 'changing the owner needs root')
+    def test_other_owner_rejected(self):
+        os.close(os.open(self.filename, os.O_CREAT, 0o600))
+        os.chown(self.filename, 1, os.getgid())
+        self.assertRaises(UnsafeFileError, SQLiteCache, self.filename)
+
+    def test_shared_directory_rejected(self):
+        # Other users could plant a journal next to the database
+        os.chmod(self.tmpdir, 0o1777)
+        self.assertRaises(UnsafeFileError, SQLiteCache, self.filename)
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test_default_filename(self):
+        runtime_dir = os.path.join(self.tmpdir, 'run')
+        os.mkdir(runtime_dir, 0o700)
+        old_runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+        os.environ['XDG_RUNTIME_DIR'] = runtime_dir
+        try:
+            cache = SQLiteCache()
+        finally:
+            if old_runtime_dir is None:
+                del os.environ['XDG_RUNTIME_DIR']
+            else:
+                os.environ['XDG_RUNTIME_DIR'] = old_runtime_dir
+        directory = os.path.join(runtime_dir, 'python-fedora')
+        self.assertEqual(cache.filename,
+                         os.path.join(directory, 'cache.sqlite'))
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+""" Test the query string handling of the CSRF middleware. """
+
+import unittest
+
+try:
+    from fedora.wsgi.csrf import _pop_query_param
+except ImportError:
+    _pop_query_param = None
+
+TOKEN = '_csrf_token'
+
+
+@unittest.skipIf(_pop_query_param is None, 'repoze.who is not installed')
+class TestPopQueryParam(unittest.TestCase):
+    def check(self, query_string, value, rest):
+        self.assertEqual(_pop_query_param(query_string, TOKEN), (value, rest))
+
+    def test_position(self):
+        self.check('_csrf_token=abc&a=1&b=2', u'abc', 'a=1&b=2')
+        self.check('a=1&_csrf_token=abc&b=2', u'abc', 'a=1&b=2')
+        self.check('a=1&b=2&_csrf_token=abc', u'abc', 'a=1&b=2')
+        self.check('_csrf_token=abc', u'abc', '')
+
+    def test_missing(self):
+        self.check('', None, '')
+        self.check('a=1&b=%20', None, 'a=1&b=%20')
+        self.check('x_csrf_token=abc&_csrf_tokens=def',
+                   None, 'x_csrf_token=abc&_csrf_tokens=def')
+
+    def test_repeated(self):
+        self.check('_csrf_token=abc&a=1&_csrf_token=def', u'def', 'a=1')
+
+    def test_name_in_value(self):
+        self.check('next=_csrf_token&a=_csrf_token%3Dx',
+                   None, 'next=_csrf_token&a=_csrf_token%3Dx')
+        self.check('next=_csrf_token&_csrf_token=abc', u'abc',
+                   'next=_csrf_token')
+
+    def test_empty_value(self):
+        self.check('a=1&_csrf_token=&b=2', u'', 'a=1&b=2')
+        self.check('a=1&_csrf_token', u'', 'a=1')
+
+    def test_encoded(self):
+        self.check('_csrf%5Ftoken=abc&a=1', u'abc', 'a=1')
+        # The value is decoded, the other parameters are left alone
+        self.check('a=%7E+x&_csrf_token=a%2Bb+c', u'a+b c', 'a=%7E+x')
+
+
+if __name__ == '__main__':
+    unittest.main()
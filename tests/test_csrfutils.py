@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+""" Test the CSRF token service. """
+
+from hashlib import sha1
+import hmac
+import hashlib
+import unittest
+
+from fedora.csrfutils import CSRFTokens
+
+SESSION = 'f3a1c0b2d4e5f60718293a4b5c6d7e8f'
+
+
+class TestCSRFTokens(unittest.TestCase):
+    def test_sha1_token(self):
+        tokens = CSRFTokens()
+        expected = sha1(SESSION.encode('ascii')).hexdigest()
+        self.assertEqual(tokens.token(SESSION), expected)
+        # Remembered
+        self.assertEqual(tokens.token(SESSION), expected)
+        self.assertTrue(tokens.check(SESSION, expected))
+        self.assertFalse(tokens.check(SESSION, expected[:-1] + 'x'))
+
+    def test_no_session(self):
+        tokens = CSRFTokens()
+        self.assertEqual(tokens.token(None), '')
+        self.assertEqual(tokens.token(''), '')
+        self.assertFalse(tokens.check(None, ''))
+        self.assertFalse(tokens.check(SESSION, None))
+
+    def test_hmac_token(self):
+        tokens = CSRFTokens()
+        unkeyed = tokens.token(SESSION)
+        tokens.secret = 'server secret'
+        expected = hmac.new(b'server secret', SESSION.encode('ascii'),
+                            hashlib.sha256).hexdigest()
+        self.assertEqual(tokens.token(SESSION), expected)
+        self.assertFalse(tokens.check(SESSION, unkeyed))
+        self.assertTrue(tokens.check(SESSION, expected))
+
+    def test_bounded(self):
+        tokens = CSRFTokens(maxsize=3)
+        for i in range(10):
+            tokens.token('session%d' % i)
+            self.assertTrue(len(tokens._tokens) <= 3)
+        self.assertEqual(tokens.token('session0'),
+                         sha1(b'session0').hexdigest())
+
+
+if __name__ == '__main__':
+    unittest.main()
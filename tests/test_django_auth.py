@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+""" Test the Django FAS auth models. """
+
+import unittest
+
+from six import StringIO
+
+try:
+    import django
+except ImportError:
+    django = None
+else:
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure(
+            DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3',
+                                   'NAME': ':memory:'}},
+            INSTALLED_APPS=['django.contrib.auth',
+                            'django.contrib.contenttypes', 'fedora.django'],
+            FAS_URL='https://fas.example.org/accounts/',
+            FAS_USERAGENT='python-fedora tests',
+            FAS_USERNAME='service', FAS_PASSWORD='secret')
+    django.setup()
+
+    from django.contrib.auth.models import Group, Permission, User
+    from django.contrib.contenttypes.models import ContentType
+    from django.core.management import call_command
+    from django.db import connection as db_connection
+
+    import fedora.django
+    from fedora.django.auth.management.commands import fas_sync_groups
+    from fedora.django.auth import models
+    from fedora.django.auth.models import FasUser
+
+
+class FakeFas(object):
+    '''Answers the FasProxyClient methods used by fedora.django.'''
+
+    def __init__(self, people=None, groups=None):
+        self.people = people or {}
+        self.groups = groups or []
+        self.requests = []
+
+    def person_by_id(self, person_id, auth_params):
+        self.requests.append(('person_by_id', person_id))
+        return 'sessionid', self.people.get(person_id)
+
+    def group_list(self, auth_params):
+        self.requests.append(('group_list', None))
+        return 'sessionid', {'groups': self.groups}
+
+
+def fas_user(user_id, human_name):
+    return {'id': user_id, 'username': 'user%s' % user_id,
+            'email': 'user%s@example.org' % user_id, 'status': 'active',
+            'human_name': human_name, 'approved_memberships': []}
+
+
+@unittest.skipIf(django is None, 'django is not installed')
+class DjangoTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        tables = db_connection.introspection.table_names()
+        if FasUser._meta.db_table in tables:
+            return
+        # fedora.django has no migrations to run
+        with db_connection.schema_editor() as editor:
+            for model in (ContentType, Permission, Group, User, FasUser):
+                editor.create_model(model)
+
+    def setUp(self):
+        self.fas = FakeFas()
+        fedora.django.connection._client = self.fas
+
+    def tearDown(self):
+        fedora.django.connection._client = None
+
+
+class TestLazyAuthCache(DjangoTestCase):
+    def test_created_on_first_use(self):
+        cache = fedora.django._LazyAuthCache()
+        self.assertEqual(cache._cache, None)
+        cache.set('key', 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache._cache.maxsize, 4096)
+        self.assertEqual(cache._cache.ttl, 300)
+
+
+class TestFasUser(DjangoTestCase):
+    def test_user_list_does_not_ask_fas(self):
+        names = ['Toshio Kuratomi', 'Madonna', 'Jean Paul Sartre', None]
+        for user_id, name in enumerate(names, 1000):
+            FasUser.objects.user_from_fas(fas_user(user_id, name))
+        users = FasUser.objects.filter(id__range=(1000, 1003)).order_by('id')
+        self.assertEqual([user.name for user in users], names)
+        self.assertEqual([user.get_full_name() for user in users],
+                         names[:-1] + ['user1003'])
+        self.assertEqual(self.fas.requests, [])
+        # Stored on the row so every process sees it
+        self.assertEqual((users[2].first_name, users[2].last_name),
+                         ('Jean', 'Paul Sartre'))
+
+    def test_name_change_is_stored(self):
+        FasUser.objects.user_from_fas(fas_user(2000, 'Old Name'))
+        FasUser.objects.user_from_fas(fas_user(2000, 'New Name'))
+        self.assertEqual(FasUser.objects.get(id=2000).name, 'New Name')
+
+    def test_long_name(self):
+        first_length = FasUser._meta.get_field('first_name').max_length
+        name = 'Maria %s' % ' '.join(['Long-Name'] * 4)
+        self.assertTrue(len(name) > 30)
+        FasUser.objects.user_from_fas(fas_user(3000, name))
+        models._human_names.clear()
+        self.assertEqual(FasUser.objects.get(id=3000).name, name)
+        self.assertEqual(self.fas.requests, [])
+        # A part longer than the field is truncated, the name comes from FAS
+        long_name = 'X' * (first_length + 5) + ' Long'
+        self.fas.people[3001] = fas_user(3001, long_name)
+        FasUser.objects.user_from_fas(self.fas.people[3001])
+        models._human_names.clear()
+        user = FasUser.objects.get(id=3001)
+        self.assertEqual(len(user.first_name), first_length)
+        self.assertEqual(user.name, long_name)
+        self.assertEqual(user.name, long_name)
+        self.assertEqual(self.fas.requests, [('person_by_id', 3001)])
+
+    def test_legacy_row(self):
+        # Stored before the name was kept in first_name and last_name
+        FasUser.objects.create(id=4000, username='user4000')
+        self.fas.people[4000] = fas_user(4000, 'Toshio Kuratomi')
+        models._human_names.clear()
+        user = FasUser.objects.get(id=4000)
+        self.assertEqual(user.name, 'Toshio Kuratomi')
+        self.assertEqual(user.get_full_name(), 'Toshio Kuratomi')
+        self.assertEqual(self.fas.requests, [('person_by_id', 4000)])
+
+
+class TestSyncGroups(DjangoTestCase):
+    def test_command(self):
+        Group.objects.create(id=3, name='oldname')
+        self.fas.groups = [{'id': gid, 'name': 'group%s' % gid}
+                           for gid in range(1, 6)]
+        out = StringIO()
+        call_command(fas_sync_groups.Command(), batch_size=2, stdout=out)
+        self.assertEqual(
+            dict(Group.objects.filter(id__range=(1, 5)).values_list(
+                'id', 'name')),
+            dict((gid, 'group%s' % gid) for gid in range(1, 6)))
+        self.assertTrue('Created 4 and renamed 1 groups' in out.getvalue())
+        self.assertEqual(self.fas.requests, [('group_list', None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+
+""" Test the caches and bulk methods of the AccountSystem client. """
+
+import fnmatch
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import warnings
+
+from fedora.client import AppError, AuthError
+from fedora.client import fas2
+from fedora.client.fas2 import AccountSystem, load_bugzilla_emails
+
+
+class FakeAccountSystem(AccountSystem):
+    '''An AccountSystem answering requests from memory.'''
+
+    def __init__(self, emails=None):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            super(FakeAccountSystem, self).__init__(
+                username='admin', password='secret', cache_session=False)
+        self.emails = emails or {}
+        self.configs = {}
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def _record(self, method, req_params):
+        with self.lock:
+            self.requests.append((method, req_params))
+
+    def send_request(self, method, req_params=None, auth=False, **kwargs):
+        self._record(method, req_params)
+        return self._answer(method, req_params)
+
+    def _proxy_request(self, method, req_params=None):
+        self._record(method, req_params)
+        return self._answer(method, req_params)
+
+    def _answer(self, method, req_params):
+        if method == 'json/person_by_username':
+            username = req_params['username']
+            if username not in self.emails:
+                return {'success': False}
+            return {'success': True, 'person': {
+                'id': 1, 'username': username,
+                'email': self.emails[username]}}
+        if method == '/user/list':
+            prefix = req_params['search'].rstrip('*')
+            return {'people': [{'username': username, 'email': email}
+                               for username, email in self.emails.items()
+                               if username.startswith(prefix)],
+                    'unapproved_people': []}
+        if method.startswith('config/list/'):
+            username, application, pattern = method.split('/')[2:]
+            if username == 'broken':
+                return {'exc': 'AppError', 'tg_flash': 'Server error'}
+            return {'configs': dict(
+                (key[2], value) for key, value in self.configs.items()
+                if key[:2] == (username, application)
+                and fnmatch.fnmatch(key[2], pattern))}
+        if method.startswith('config/set/'):
+            key = tuple(method.split('/')[2:])
+            self.configs[key] = req_params['value']
+            return {}
+        raise AssertionError('Unexpected request %s' % method)
+
+
+class TestBugzillaEmails(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'emails.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, overrides, mtime):
+        with open(self.filename, 'w') as email_file:
+            json.dump(overrides, email_file)
+        os.utime(self.filename, (mtime, mtime))
+
+    def test_mapping(self):
+        bugzilla, alternate = load_bugzilla_emails({'42': 'bz@example.org'})
+        self.assertEqual(bugzilla[42], 'bz@example.org')
+        self.assertEqual(alternate['bz@example.org'], 42)
+        # The builtin entries are kept
+        self.assertEqual(bugzilla[100029], 'icon@fedoraproject.org')
+        self.assertTrue(load_bugzilla_emails({'42': 'bz@example.org'})[0]
+                        is bugzilla)
+
+        def change():
+            bugzilla[43] = 'x'
+        self.assertRaises(TypeError, change)
+
+    def test_file_reread_when_changed(self):
+        self.write({'42': 'old@example.org'}, 1000)
+        bugzilla = load_bugzilla_emails(self.filename)[0]
+        self.assertEqual(bugzilla[42], 'old@example.org')
+        self.assertTrue(load_bugzilla_emails(self.filename)[0] is bugzilla)
+        self.write({'42': 'new@example.org'}, 2000)
+        self.assertEqual(load_bugzilla_emails(self.filename)[0][42],
+                         'new@example.org')
+        # Only the latest version of the file is kept
+        self.assertEqual(
+            [key for key in fas2._email_maps if key == self.filename],
+            [self.filename])
+        self.assertEqual(fas2._email_maps[self.filename][0], 2000)
+
+    def test_account_system_overrides(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            fas = AccountSystem(cache_session=False,
+                                bugzilla_emails={'42': 'bz@example.org'})
+            other = AccountSystem(cache_session=False)
+        self.assertEqual(fas._AccountSystem__bugzilla_email[42],
+                         'bz@example.org')
+        self.assertFalse(42 in other._AccountSystem__bugzilla_email)
+
+
+class TestSharedProxy(unittest.TestCase):
+    def test_shared_between_instances(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            first = AccountSystem(cache_session=False)
+            second = AccountSystem(cache_session=False)
+            insecure = AccountSystem(cache_session=False, insecure=True)
+        self.assertTrue(first.proxy is second.proxy)
+        self.assertFalse(first.proxy is insecure.proxy)
+        self.assertTrue(insecure.proxy.insecure)
+
+
+class TestAvatars(unittest.TestCase):
+    def test_avatar_url_cached(self):
+        fas = FakeAccountSystem({'toshio': 'toshio@example.org'})
+        url = fas.avatar_url('toshio', service='gravatar')
+        self.assertTrue(url.startswith('http://www.gravatar.com/avatar/'))
+        self.assertEqual(fas.avatar_url('toshio', service='gravatar'), url)
+        self.assertEqual(len(fas.requests), 1)
+        # A different size is a different url but the email is cached
+        self.assertNotEqual(
+            fas.avatar_url('toshio', size=32, service='gravatar'), url)
+        self.assertEqual(len(fas.requests), 1)
+
+    def test_avatar_urls_per_user(self):
+        emails = {'alice': 'a@example.org', 'bob': 'b@example.org'}
+        fas = FakeAccountSystem(emails)
+        urls = fas.avatar_urls(['alice', 'bob', 'nobody'],
+                               service='gravatar')
+        self.assertEqual(sorted(urls), ['alice', 'bob', 'nobody'])
+        self.assertEqual(urls['alice'],
+                         fas.avatar_url('alice', service='gravatar'))
+        methods = sorted(method for method, params in fas.requests)
+        self.assertEqual(methods, ['json/person_by_username'] * 3)
+
+    def test_avatar_urls_shared_prefix(self):
+        emails = dict(('pkg%02d' % i, 'pkg%02d@example.org' % i)
+                      for i in range(10))
+        emails['zed'] = 'zed@example.org'
+        fas = FakeAccountSystem(emails)
+        usernames = sorted(list(emails) + ['pkgmissing'])
+        urls = fas.avatar_urls(usernames, service='gravatar')
+        self.assertEqual(sorted(urls), usernames)
+        # One small request per user, even when they share a prefix
+        self.assertEqual(sorted(method for method, params in fas.requests),
+                         ['json/person_by_username'] * len(usernames))
+        # Everything is cached now
+        fas.avatar_urls(usernames, service='gravatar')
+        self.assertEqual(len(fas.requests), len(usernames))
+        self.assertEqual(
+            urls['pkg03'], fas.avatar_url('pkg03', service='gravatar'))
+
+
+class CachingAccountSystem(FakeAccountSystem):
+    config_cache_size = 100
+
+
+class FakeProxy(object):
+    '''A FasProxyClient handing out FAS sessions.'''
+
+    def __init__(self):
+        self.session_id = None
+        self.logins = 0
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def send_request(self, method, req_params=None, auth_params=None,
+                     **kwargs):
+        with self.lock:
+            self.requests.append(dict(auth_params))
+            if 'password' in auth_params:
+                self.logins += 1
+                self.session_id = 'session%s' % self.logins
+            elif auth_params.get('session_id') != self.session_id:
+                raise AuthError('Session expired')
+        return self.session_id, {'configs': {}}
+
+
+class ProxyAccountSystem(AccountSystem):
+    '''An AccountSystem talking to a FakeProxy.'''
+
+    def __init__(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            super(ProxyAccountSystem, self).__init__(
+                username='admin', password='secret', cache_session=False)
+        self.proxy = FakeProxy()
+
+
+class TestConfigs(unittest.TestCase):
+    def test_not_cached_by_default(self):
+        fas = FakeAccountSystem()
+        fas.configs[('toshio', 'app', 'color')] = 'blue'
+        self.assertEqual(fas.get_config('toshio', 'app', 'color'), 'blue')
+        # Changed by another client
+        fas.configs[('toshio', 'app', 'color')] = 'red'
+        self.assertEqual(fas.get_config('toshio', 'app', 'color'), 'red')
+        self.assertEqual(len(fas.requests), 2)
+
+    def test_cache_opt_in(self):
+        fas = CachingAccountSystem()
+        fas.configs[('toshio', 'app', 'color')] = 'blue'
+        self.assertEqual(fas.get_config('toshio', 'app', 'color'), 'blue')
+        self.assertEqual(fas.get_config('toshio', 'app', 'color'), 'blue')
+        self.assertEqual(fas.get_config('toshio', 'app', 'size'), None)
+        self.assertEqual(fas.get_config('toshio', 'app', 'size'), None)
+        self.assertEqual(len(fas.requests), 2)
+
+    def test_set_config_updates_cache(self):
+        fas = CachingAccountSystem()
+        fas.configs[('toshio', 'app', 'color')] = 'blue'
+        self.assertEqual(fas.get_config('toshio', 'app', 'color'), 'blue')
+        fas.set_config('toshio', 'app', 'color', 'green')
+        self.assertEqual(fas.get_config('toshio', 'app', 'color'), 'green')
+        self.assertEqual(len(fas.requests), 2)
+
+    def test_get_configs_bulk(self):
+        fas = CachingAccountSystem()
+        for i in range(5):
+            fas.configs[('user%s' % i, 'app', 'color')] = 'color%s' % i
+            fas.configs[('user%s' % i, 'app', 'size')] = i
+        keys = [('user%s' % i, 'app', attribute) for i in range(6)
+                for attribute in ('color', 'size')]
+        values = fas.get_configs_bulk(keys, max_workers=4)
+        self.assertEqual(len(values), 12)
+        self.assertEqual(values[('user3', 'app', 'color')], 'color3')
+        self.assertEqual(values[('user3', 'app', 'size')], 3)
+        self.assertEqual(values[('user5', 'app', 'size')], None)
+        # One request per username and application
+        self.assertEqual(len(fas.requests), 6)
+        self.assertEqual(fas.get_configs_bulk(keys), values)
+        self.assertEqual(len(fas.requests), 6)
+
+    def test_get_configs_bulk_error(self):
+        fas = CachingAccountSystem()
+        keys = [('toshio', 'app', 'color'), ('broken', 'app', 'color')]
+        self.assertRaises(AppError, fas.get_configs_bulk, keys)
+        self.assertEqual(len(fas._config_cache), 0)
+
+    def test_proxy_session_reused(self):
+        fas = ProxyAccountSystem()
+        keys = [('user%s' % i, 'app', 'color') for i in range(10)]
+        fas.get_configs_bulk(keys, max_workers=4)
+        self.assertEqual(fas.proxy.logins, 1)
+        self.assertEqual(len(fas.proxy.requests), 10)
+        # Log in again once the session expires
+        fas.proxy.session_id = 'expired'
+        fas.get_configs_bulk([('other', 'app', 'color')])
+        fas.get_configs_bulk([('another', 'app', 'color')])
+        self.assertEqual(fas.proxy.logins, 2)
+        self.assertEqual(fas.proxy.requests[-1], {'session_id': 'session2'})
+
+    def test_set_configs_bulk(self):
+        fas = CachingAccountSystem()
+        entries = [('user%s' % i, 'app', 'color', 'color%s' % i)
+                   for i in range(10)]
+        fas.set_configs_bulk(entries, max_workers=4)
+        self.assertEqual(fas.configs, dict(
+            (entry[:3], entry[3]) for entry in entries))
+        self.assertEqual(fas.get_config('user7', 'app', 'color'), 'color7')
+        self.assertEqual(len(fas.requests), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
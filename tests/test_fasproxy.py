@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+""" Test the verified credentials cache of the FasProxyClient. """
+
+import unittest
+
+from fedora.client import AuthError, FasProxyClient
+
+PASSWORDS = {'toshio': 'right'}
+
+
+class FakeFasProxyClient(FasProxyClient):
+    '''A FasProxyClient checking passwords against a dict.'''
+
+    def __init__(self, **kwargs):
+        super(FakeFasProxyClient, self).__init__(
+            'https://fas.example.org/accounts/', **kwargs)
+        self.passwords = dict(PASSWORDS)
+        self.requests = []
+
+    def send_request(self, method, req_params=None, auth_params=None,
+                     **kwargs):
+        self.requests.append(auth_params['username'])
+        if self.passwords.get(auth_params['username']) \
+                != auth_params['password']:
+            raise AuthError('Unable to log into server')
+        return 'sessionid', {}
+
+
+class TestVerifyPassword(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeFasProxyClient(password_cache_size=10)
+
+    def test_cache_hit_skips_fas(self):
+        self.assertTrue(self.client.verify_password('toshio', 'right'))
+        self.assertTrue(self.client.verify_password('toshio', 'right'))
+        self.assertEqual(self.client.requests, ['toshio'])
+        # Only a salted hash of the password is kept
+        salt, digest = self.client._password_cache['toshio']
+        self.assertEqual(len(salt), 16)
+        self.assertFalse(b'right' in digest)
+
+    def test_no_cache_by_default(self):
+        client = FakeFasProxyClient()
+        self.assertTrue(client.verify_password('toshio', 'right'))
+        self.assertTrue(client.verify_password('toshio', 'right'))
+        self.assertEqual(client.requests, ['toshio', 'toshio'])
+
+    def test_wrong_password_never_matches_cache(self):
+        self.assertTrue(self.client.verify_password('toshio', 'right'))
+        self.assertFalse(self.client.verify_password('toshio', 'wrong'))
+        self.assertFalse(self.client.verify_password('toshio', ''))
+        self.assertEqual(len(self.client.requests), 3)
+
+    def test_auth_error_drops_entry(self):
+        self.assertTrue(self.client.verify_password('toshio', 'right'))
+        # The password changed in FAS
+        self.client.passwords['toshio'] = 'new'
+        self.assertFalse(self.client.verify_password('toshio', 'new2'))
+        self.assertFalse('toshio' in self.client._password_cache)
+        # The old password has to be verified by FAS again
+        self.assertFalse(self.client.verify_password('toshio', 'right'))
+        self.assertEqual(len(self.client.requests), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
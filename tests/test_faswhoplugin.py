@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+""" Test the identity cache of the FASWhoPlugin. """
+
+import io
+import unittest
+
+try:
+    from fedora.wsgi.faswho.faswhoplugin import FASWhoPlugin
+except ImportError:
+    FASWhoPlugin = None
+
+SESSION = 'f3a1c0b2d4e5f60718293a4b5c6d7e8f'
+
+
+def make_environ():
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': '/',
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_COOKIE': 'tg-visit=%s' % SESSION,
+        'wsgi.input': io.BytesIO(b''),
+        'wsgi.url_scheme': 'http',
+    }
+
+
+class FakeFas(object):
+    '''Answers get_user_info() from memory.'''
+
+    def __init__(self):
+        self.requests = []
+
+    def get_user_info(self, auth_params):
+        self.requests.append(auth_params)
+        return (SESSION, {'username': 'toshio', 'password': 'hash',
+                          'approved_memberships': [{'name': 'packager'}]})
+
+
+@unittest.skipIf(FASWhoPlugin is None, 'repoze.who is not installed')
+class TestAuthenticate(unittest.TestCase):
+    def setUp(self):
+        self.plugin = FASWhoPlugin('https://fas.example.org/accounts/')
+        self.plugin.fas = FakeFas()
+
+    def test_cached_session_skips_fas(self):
+        for i in range(2):
+            environ = make_environ()
+            identity = self.plugin.identify(environ)
+            self.assertEqual(
+                self.plugin.authenticate(environ, identity), 'toshio')
+            self.assertEqual(identity['session_id'], SESSION)
+        self.assertEqual(self.plugin.fas.requests,
+                         [{'session_id': SESSION}])
+        # The cached record is left alone
+        cached = self.plugin.cache.get(SESSION)
+        self.assertEqual(cached[1]['password'], 'hash')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+""" Test the user caching of the flask_fas_openid plugin. """
+
+import unittest
+
+try:
+    import flask
+    from flask_fas_openid import FAS
+except ImportError:
+    flask = None
+
+from fedora.cacheutils import LRUCache
+
+USER = {'username': 'toshio', 'fullname': 'Toshio', 'email': 't@example.org',
+        'timezone': 'UTC', 'cla_done': True, 'groups': ['packager'],
+        'login_time': 0}
+
+
+def make_app(user_store):
+    app = flask.Flask(__name__)
+    app.secret_key = 'secret'
+    app.config['FAS_OPENID_USER_STORE'] = user_store
+    fas = FAS(app)
+
+    @app.route('/')
+    def index():
+        if flask.g.fas_user is None:
+            return 'anonymous'
+        return flask.g.fas_user.username
+
+    @app.route('/join')
+    def join():
+        flask.g.fas_user.approved_memberships.append(
+            flask.g.fas_user.__class__(name='sysadmin'))
+        flask.g.fas_user.ssh_key = 'changed'
+        return 'joined'
+
+    @app.route('/groups')
+    def groups():
+        return ' '.join(group.name for group
+                        in flask.g.fas_user.approved_memberships)
+
+    @app.route('/logout')
+    def logout():
+        fas.logout()
+        return 'bye'
+
+    return app
+
+
+@unittest.skipIf(flask is None, 'flask is not installed')
+class TestUserStore(unittest.TestCase):
+    def setUp(self):
+        self.user_store = LRUCache(100)
+        self.apps = [make_app(self.user_store), make_app(self.user_store)]
+        token = 'abcdef'
+        self.user_store.set(FAS._user_store_key(token), USER)
+        self.clients = [app.test_client() for app in self.apps]
+        for client in self.clients:
+            with client.session_transaction() as session:
+                session['FLASK_FAS_OPENID_USER'] = {'token': token}
+
+    def get(self, client, url='/'):
+        return client.get(url).get_data(as_text=True)
+
+    def test_logout_applies_to_every_worker(self):
+        for client in self.clients:
+            self.assertEqual(self.get(client), 'toshio')
+        self.assertEqual(self.get(self.clients[0], '/logout'), 'bye')
+        self.assertEqual(self.get(self.clients[0]), 'anonymous')
+        # The second worker still has the user object cached but the token
+        # is gone from the shared store
+        self.assertEqual(self.get(self.clients[1]), 'anonymous')
+
+    def test_changes_do_not_leak_between_requests(self):
+        client = self.clients[0]
+        self.assertEqual(self.get(client, '/join'), 'joined')
+        self.assertEqual(self.get(client, '/groups'), 'packager')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+""" Test the compact group_data representation. """
+
+import unittest
+
+import six
+
+from fedora.client.fas2 import GroupData
+
+RAW = {
+    'packager': {
+        'type': 'pkgdb',
+        'administrators': [100001],
+        'sponsors': [100003, 100002],
+        'users': [100010, 100005, 100004],
+    },
+    'sysadmin': {
+        'type': 'tracking',
+        'administrators': [100002],
+        'sponsors': [],
+        'users': [100004],
+    },
+}
+
+
+class TestGroupData(unittest.TestCase):
+    def setUp(self):
+        self.data = GroupData(RAW)
+
+    def test_mapping(self):
+        self.assertEqual(len(self.data), 2)
+        self.assertEqual(sorted(self.data), ['packager', 'sysadmin'])
+        self.assertTrue('packager' in self.data)
+        group = self.data['packager']
+        self.assertEqual(group.type, 'pkgdb')
+        self.assertEqual(list(group.sponsors), [100002, 100003])
+
+    def test_is_member(self):
+        self.assertTrue(self.data.is_member(100005, 'packager'))
+        self.assertTrue(self.data.is_member(100001, 'packager'))
+        self.assertFalse(self.data.is_member(100006, 'packager'))
+        self.assertFalse(self.data.is_member(100005, 'sysadmin'))
+        self.assertFalse(self.data.is_member(100005, 'nosuchgroup'))
+        self.assertFalse(self.data.is_member(
+            100005, 'packager', roles=('sponsors',)))
+
+    def test_groups_of(self):
+        self.assertEqual(self.data.groups_of(100004),
+                         ['packager', 'sysadmin'])
+        self.assertEqual(self.data.groups_of(100002),
+                         ['packager', 'sysadmin'])
+        self.assertEqual(self.data.groups_of(100002,
+                                             roles=('administrators',)),
+                         ['sysadmin'])
+        self.assertEqual(self.data.groups_of(999999), [])
+
+    def test_non_ascii_names(self):
+        data = GroupData({u'gr\xfcppe': {'type': u't\xfdpe',
+                                         'users': [100004]}})
+        self.assertTrue(data.is_member(100004, u'gr\xfcppe'))
+        self.assertEqual(data.groups_of(100004), [u'gr\xfcppe'])
+        self.assertEqual(data[u'gr\xfcppe'].type, u't\xfdpe')
+
+    def test_key_types(self):
+        # Names keep their type whether or not they are plain ASCII
+        data = GroupData({u'packager': {'type': u'pkgdb', 'users': [1]},
+                          u'gr\xfcppe': {'type': u't\xfdpe', 'users': [1]},
+                          'sysadmin': {'type': 'tracking', 'users': [1]}})
+        for name in data:
+            expected = str if name == 'sysadmin' else six.text_type
+            self.assertTrue(type(name) is expected, repr(name))
+            self.assertTrue(type(data[name].type) is expected, repr(name))
+        for name in data.groups_of(1):
+            expected = str if name == 'sysadmin' else six.text_type
+            self.assertTrue(type(name) is expected, repr(name))
+
+    def test_groups_of_matches_members(self):
+        for user_id in (100001, 100002, 100003, 100004, 100005, 100010):
+            for roles in (('administrators',), ('sponsors', 'users'),
+                          ('administrators', 'sponsors', 'users')):
+                self.assertEqual(
+                    self.data.groups_of(user_id, roles=roles),
+                    sorted(name for name in self.data
+                           if self.data.is_member(user_id, name, roles)))
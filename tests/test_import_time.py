@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+""" Check that importing fedora.client stays cheap. """
+
+import os
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ('requests', 'urllib3', 'lockfile', 'kitchen.i18n',
+                 'fedora.client.fas2', 'fedora.client.wiki',
+                 'fedora.client.openidbaseclient')
+
+
+def imported_modules(statement):
+    '''Return the modules `python -X importtime` reports for `statement`.'''
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + [p for p in [env.get('PYTHONPATH')] if p])
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stderr=subprocess.PIPE, env=env, universal_newlines=True)
+    output = process.communicate()[1]
+    if process.returncode:
+        raise AssertionError(output)
+
+    modules = {}
+    for line in output.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            modules[fields[2].strip()] = int(fields[1])
+        except ValueError:
+            # Header line
+            continue
+    return modules
+
+
+@unittest.skipIf(sys.version_info < (3, 7),
+                 'needs -X importtime and module __getattr__')
+class TestImportTime(unittest.TestCase):
+    def test_client_is_lazy(self):
+        modules = imported_modules('import fedora.client')
+        self.assertIn('fedora.client', modules)
+        for name in HEAVY_MODULES:
+            self.assertNotIn(name, modules)
+
+    def test_exceptions_are_lazy(self):
+        modules = imported_modules('from fedora.client import AuthError')
+        for name in HEAVY_MODULES:
+            self.assertNotIn(name, modules)
+
+    def test_client_class_imports_its_module(self):
+        modules = imported_modules('from fedora.client import AccountSystem')
+        self.assertIn('fedora.client.fas2', modules)
+        self.assertNotIn('fedora.client.wiki', modules)
+
+    def test_gettext_is_lazy(self):
+        self.assertNotIn('kitchen.i18n', imported_modules('import fedora'))
+        self.assertIn('kitchen.i18n', imported_modules('from fedora import _'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+""" Test the connection handling of the ProxyClient. """
+
+import json
+import threading
+import unittest
+import warnings
+
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
+
+from fedora.client.proxyclient import ProxyClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.seen.append((self.client_address[1],
+                                 self.headers.get('Cookie')))
+        body = json.dumps({'success': True}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Set-Cookie', 'tg-visit=fromserver; Path=/')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class TestProxyClientConnections(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.seen = []
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.client = ProxyClient(
+                'http://127.0.0.1:%s/' % self.server.server_port,
+                session_as_cookie=False)
+
+    def tearDown(self):
+        self.client._http_session().close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reused(self):
+        for i in range(3):
+            self.client.send_request('json', auth_params={'session_id': 'a'})
+        ports = set(port for port, cookie in self.server.seen)
+        self.assertEqual(len(ports), 1)
+
+    def test_cookies_not_shared(self):
+        session_id, data = self.client.send_request(
+            'json', auth_params={'session_id': 'a'})
+        self.assertEqual(session_id, 'fromserver')
+        self.client.send_request('json')
+        self.assertEqual(self.server.seen[0][1], 'tg-visit=a')
+        self.assertEqual(self.server.seen[1][1], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -51,3 +51,31 @@ class TestURLUtils(unittest.TestCase):
         params = [('foo', 'yes')]
         actual = update_qs(original, params)
         self.assertEqual(actual, expected)
+
+    def test_replace_keeps_other_params(self):
+        original = base + "?a=1&_csrf_token=old&b=x+y#top"
+        expected = base + "?a=1&_csrf_token=new&b=x+y#top"
+        params = dict(_csrf_token="new")
+        actual = update_qs(original, params)
+        self.assertEqual(actual, expected)
+
+    def test_quoted_name(self):
+        original = base + "?c+d=1"
+        expected = base + "?c+d=2"
+        params = {'c d': '2'}
+        actual = update_qs(original, params)
+        self.assertEqual(actual, expected)
+
+    def test_repeated_uri(self):
+        # The second call uses the cached parse of the uri
+        original = base + "?foo=yes"
+        self.assertEqual(update_qs(original, dict(bar="1")),
+                         base + "?foo=yes&bar=1")
+        self.assertEqual(update_qs(original, dict(bar="2")),
+                         base + "?foo=yes&bar=2")
+        self.assertEqual(update_qs(original, dict(foo="no"), overwrite=False),
+                         base + "?foo=yes&foo=no")
+
+    def test_values_equal_but_encoded_differently(self):
+        self.assertEqual(update_qs(base, dict(foo=1)), base + "?foo=1")
+        self.assertEqual(update_qs(base, dict(foo=True)), base + "?foo=True")
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+""" Test the revision crawler and recent changes of the Wiki client. """
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import warnings
+from datetime import datetime, timedelta
+
+from fedora.client.wiki import Wiki, count_changes, top_counts
+
+LATEST_REVID = 230
+BAD_REVIDS = frozenset((7, 120))
+
+
+class FakeWiki(Wiki):
+    '''A Wiki answering API requests from memory.'''
+
+    def __init__(self, fail_at=None):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            super(FakeWiki, self).__init__(cache_session=False)
+        self.fail_at = fail_at
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def send_request(self, method, req_params=None, **kwargs):
+        assert req_params['list'] == 'recentchanges'
+        return {'query': {'recentchanges': [{'revid': LATEST_REVID}]}}
+
+    def _threadsafe_request(self, method, req_params, auth_params):
+        revids = [int(rev) for rev in req_params['revids'].split('|')]
+        with self.lock:
+            self.requested.extend(revids)
+        if self.fail_at in revids:
+            raise IOError('connection lost')
+        pages = {}
+        for revid in revids:
+            if revid in BAD_REVIDS:
+                continue
+            page = pages.setdefault(str(revid % 3), {
+                'title': 'Page %s' % (revid % 3), 'revisions': []})
+            page['revisions'].append({
+                'revid': revid,
+                'user': 'ImportUser' if revid % 10 == 0 else 'user%s' % revid,
+                'timestamp': '2018-01-01T00:00:00Z',
+                'comment': 'edit %s' % revid,
+            })
+        return {'query': {'pages': pages}}
+
+
+def expected_revids(start=1):
+    return [revid for revid in range(start, LATEST_REVID)
+            if revid not in BAD_REVIDS and revid % 10]
+
+
+class TestRevisions(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.tmpdir, 'crawl.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_iter_revisions_in_order(self):
+        revisions = list(FakeWiki().iter_revisions(max_workers=3))
+        self.assertEqual([revid for revid, rev in revisions],
+                         expected_revids())
+        self.assertEqual(revisions[0][1]['user'], 'user1')
+        self.assertEqual(revisions[0][1]['title'], 'Page 1')
+
+    def test_fetch_all_revisions(self):
+        calls = []
+        revs = FakeWiki().fetch_all_revisions(
+            start=100, callback=lambda revs, pending: calls.append(
+                (len(revs), len(pending))))
+        self.assertEqual(sorted(revs), expected_revids(100))
+        self.assertEqual(calls[-1], (len(expected_revids(100)), 0))
+        self.assertEqual(calls[0][1], LATEST_REVID - 150)
+        # Only iter_revisions() resumes from a checkpoint
+        self.assertRaises(TypeError, FakeWiki().fetch_all_revisions,
+                          checkpoint=self.checkpoint)
+
+    def test_resume_from_checkpoint(self):
+        wiki = FakeWiki(fail_at=160)
+        seen = []
+        with self.assertRaises(IOError):
+            for revid, rev in wiki.iter_revisions(checkpoint=self.checkpoint):
+                seen.append(revid)
+        self.assertEqual(seen, expected_revids()[:len(seen)])
+
+        wiki = FakeWiki()
+        for revid, rev in wiki.iter_revisions(checkpoint=self.checkpoint):
+            seen.append(revid)
+        self.assertEqual(sorted(set(seen)), expected_revids())
+        self.assertEqual(min(wiki.requested), 151)
+
+
+class RecentChangesWiki(Wiki):
+    '''A Wiki returning pages of recent changes from memory.'''
+
+    def __init__(self, changes, old_continue=False):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            super(RecentChangesWiki, self).__init__(cache_session=False)
+        self.changes = changes
+        self.old_continue = old_continue
+        self.requests = []
+
+    def send_request(self, method, req_params=None, **kwargs):
+        self.requests.append(dict(req_params))
+        start = int(req_params.get('rccontinue', 0))
+        end = start + req_params['rclimit']
+        data = {'query': {'recentchanges': self.changes[start:end]}}
+        if end < len(self.changes):
+            if self.old_continue:
+                data['query-continue'] = {
+                    'recentchanges': {'rccontinue': str(end)}}
+            else:
+                data['continue'] = {'rccontinue': str(end),
+                                    'continue': '-||'}
+        return data
+
+
+class TestRecentChanges(unittest.TestCase):
+    def setUp(self):
+        self.changes = [{'user': 'user%s' % (i % 7),
+                         'title': 'Page %s' % (i % 4)} for i in range(1234)]
+        self.now = datetime(2018, 1, 8)
+        self.then = self.now - timedelta(days=7)
+
+    def test_follows_continuation(self):
+        for old_continue in (False, True):
+            wiki = RecentChangesWiki(self.changes, old_continue)
+            changes = list(wiki.iter_recent_changes(self.now, self.then))
+            self.assertEqual(changes, self.changes)
+            self.assertEqual(len(wiki.requests), 3)
+            self.assertEqual(wiki.requests[0]['rcstart'],
+                             '2018-01-08T00:00:00Z')
+
+    def test_count_changes(self):
+        num_changes, users, pages = count_changes(iter(self.changes))
+        self.assertEqual(num_changes, 1234)
+        self.assertEqual(users['user0'], 177)
+        self.assertEqual(top_counts(pages, 2), [('Page 0', 309),
+                                                ('Page 1', 309)])
+        self.assertEqual(top_counts(users, 10), sorted(
+            users.items(), key=lambda x: x[1], reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
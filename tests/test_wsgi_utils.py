@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+""" Test the helpers shared by the WSGI components. """
+
+import io
+import unittest
+
+from fedora.wsgi.utils import REQUEST_ENV_KEY, get_request
+
+
+def make_environ(query='', body=b''):
+    return {
+        'REQUEST_METHOD': 'POST',
+        'PATH_INFO': '/',
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'HTTP_COOKIE': 'tg-visit=abc',
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.url_scheme': 'http',
+    }
+
+
+class TestGetRequest(unittest.TestCase):
+    def test_shared_within_request(self):
+        environ = make_environ('a=1', b'b=2')
+        request = get_request(environ)
+        self.assertTrue(environ[REQUEST_ENV_KEY] is request)
+        self.assertTrue(get_request(environ) is request)
+        self.assertEqual(request.GET['a'], '1')
+        self.assertEqual(request.POST['b'], '2')
+        self.assertEqual(request.cookies['tg-visit'], 'abc')
+
+    def test_changes_are_shared(self):
+        environ = make_environ('a=1&c=3')
+        del get_request(environ).GET['a']
+        self.assertEqual(list(get_request(environ).GET.items()), [('c', '3')])
+        self.assertEqual(environ['QUERY_STRING'], 'c=3')
+
+    def test_copied_environ(self):
+        environ = make_environ('a=1')
+        request = get_request(environ)
+        copy = dict(environ)
+        copied_request = get_request(copy)
+        self.assertFalse(copied_request is request)
+        self.assertTrue(copied_request.environ is copy)
+        self.assertTrue(get_request(environ) is request)
+
+
+if __name__ == '__main__':
+    unittest.main()